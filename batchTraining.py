@@ -0,0 +1,100 @@
+import argparse
+import logging
+import random
+import time
+
+from bitBoard import BitBoard
+from boardGeometry import STANDARD
+from boardTables import Tile, STATE_COUNT, TRANSFORM_CELLS, CANONICAL_KEYS, CANONICAL_TRANSFORMS, UNIQUE_MOVES
+
+KEY_RESULTS = [BitBoard.fromKey(key).isGameOver() for key in range(STATE_COUNT)]
+MASK_CELLS = [tuple(cell for cell in range(9) if mask >> cell & 1) for mask in range(512)]
+POWERS = [3**cell for cell in range(9)]
+
+def playBatchAgainstRandom(machine, machineStarts, training=True, winDelta=1, drawDelta=0, loseDelta=-10, rng=random):
+    #Plays one game per entry of machineStarts, all advanced a ply at a time on encoded keys.
+    #Every game in the batch sees the same beads; the bead changes are applied once the batch is over.
+    if machine.geometry is not STANDARD:
+        raise ValueError("Batched training only supports the 3x3 board, not {}".format(machine.geometry))
+
+    gameCount = len(machineStarts)
+    keys = [0]*gameCount
+    results = [False]*gameCount
+    trajectories = [[] for game in range(gameCount)]
+
+    active = range(gameCount)
+    for ply in range(9):
+        digit = 1 if ply % 2 == 0 else 2 #Noughts always go first
+        machinesTurn = ply % 2 == 0
+
+        machineMoves = {}
+        machineGames = [game for game in active if machineStarts[game] == machinesTurn]
+        if ply == 8:
+            for game in machineGames:
+                machineMoves[game] = MASK_CELLS[UNIQUE_MOVES[keys[game]]][0]
+        else:
+            canonicalKeys = [CANONICAL_KEYS[keys[game]] for game in machineGames]
+            for game, canonicalKey, bead in zip(machineGames, canonicalKeys, machine.pickBeads(canonicalKeys, rng)):
+                if training:
+                    trajectories[game].append((machine.getStateId(canonicalKey), bead[1]*3 + bead[0]))
+                machineMoves[game] = TRANSFORM_CELLS[CANONICAL_TRANSFORMS[keys[game]]][bead[1]*3 + bead[0]]
+
+        stillActive = []
+        for game in active:
+            key = keys[game]
+            if game in machineMoves:
+                cell = machineMoves[game]
+            else:
+                cell = rng.choice(MASK_CELLS[UNIQUE_MOVES[key]])
+
+            key += digit*POWERS[cell]
+            keys[game] = key
+            result = KEY_RESULTS[key]
+            if result is False:
+                stillActive.append(game)
+            else:
+                results[game] = result
+        active = stillActive
+
+    if training:
+        for trajectory, result, machineStart in zip(trajectories, results, machineStarts):
+            won = Tile.Noughts if machineStart else Tile.Crosses
+            beadChange = drawDelta if result == Tile.Empty else winDelta if result == won else loseDelta
+            machine.addMoveBeads(trajectory, beadChange)
+
+    return results
+
+def trainAgainstRandom(machine, games, batchSize=256, training=True, winDelta=1, drawDelta=0, loseDelta=-10, rng=random):
+    #Alternates who starts in the same way as the training loop in machineLearningSimulation
+    results = []
+    for firstGame in range(0, games, batchSize):
+        machineStarts = [game % 2 == 0 for game in range(firstGame, min(firstGame + batchSize, games))]
+        results.extend(playBatchAgainstRandom(machine, machineStarts, training, winDelta, drawDelta, loseDelta, rng))
+    return results
+
+if __name__ == "__main__":
+    from machineLearningSimulation import Machine, loadMachine, saveMachine
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    parser = argparse.ArgumentParser(description="Train a machine against a random player in batches of games.")
+    parser.add_argument("games", type=int)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--machine", default="trainedMachine.pickle")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    try:
+        machine = loadMachine(args.machine)
+        logging.info("Loaded machine from pickle file.")
+    except FileNotFoundError:
+        logging.info("Could not find pickle file, so creating a blank machine.")
+        machine = Machine()
+
+    startTime = time.time()
+    trainAgainstRandom(machine, args.games, args.batch_size, rng=random.Random(args.seed))
+    seconds = time.time() - startTime
+    logging.info("Played {} games in {:.1f} seconds ({:.0f} games/sec).".format(args.games, seconds, args.games/seconds))
+
+    saveMachine(machine, args.machine)
+    logging.info("Saved machine to pickle file.")
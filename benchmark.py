@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from bitBoard import BitBoard
+from createBoardsPickle import getAllBoardsFrom
+from machineLearningSimulation import Board, GameManager, getAllBoards, loadMachine, saveMachine
+
+#Per-call times of the training and inference hot paths, as JSON that only changes when the timings do.
+#Every benchmark reseeds random, so each run does exactly the same work.
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+MACHINE_PATH = os.path.join(DIRECTORY, "trainedMachine.pickle")
+BASELINE_PATH = os.path.join(DIRECTORY, "benchmarkBaseline.json")
+SEED = 2017
+SAMPLE_SIZE = 1000
+
+def getSampleStates(): #Fixed in-play states, some repeated, in a fixed order
+    rng = random.Random(SEED)
+    states = [state for state in getAllBoards() if not BitBoard.fromState(state).isGameOver()]
+    return [rng.choice(states) for i in range(SAMPLE_SIZE)]
+
+def getBenchmarks():
+    #name: (calls per run, function doing those calls, untimed setup before each run or None)
+    states = getSampleStates()
+    boards = [Board(state) for state in states]
+    bitBoards = [BitBoard.fromState(state) for state in states]
+    machine = loadMachine(MACHINE_PATH)
+    matchboxes = [machine.getMatchbox(board) for board in bitBoards]
+
+    def newBoards(): #Boards cache their symmetry info, so every run starts from new ones
+        boards[:] = [Board(state) for state in states]
+        bitBoards[:] = [BitBoard.fromState(state) for state in states]
+    savePath = os.path.join(tempfile.gettempdir(), "benchmarkMachine.pickle")
+    emptyState = Board.empty().state
+
+    def makeMoves():
+        for board in bitBoards:
+            machine.makeMove(board)
+        machine.moves = []
+
+    trainingMachines = []
+
+    def loadTrainingMachine(): #Every run trains its own copy from the same start
+        trainingMachines[:] = [loadMachine(MACHINE_PATH)]
+
+    def playGames():
+        for game in range(1000):
+            GameManager.playAgainstRandom(trainingMachines[0], game % 2 == 0)
+
+    benchmarks = {}
+    for name, boardList in (("Board", boards), ("BitBoard", bitBoards)):
+        benchmarks[name + ".standardise"] = (len(boardList), lambda boardList=boardList: [board.standardise() for board in boardList], newBoards)
+        benchmarks[name + ".getUniqueMoves"] = (len(boardList), lambda boardList=boardList: [board.getUniqueMoves() for board in boardList], newBoards)
+        benchmarks[name + ".isGameOver"] = (len(boardList), lambda boardList=boardList: [board.isGameOver() for board in boardList], None)
+    benchmarks["Machine.getMatchbox"] = (len(bitBoards), lambda: [machine.getMatchbox(board) for board in bitBoards], newBoards)
+    benchmarks["Machine.makeMove"] = (len(bitBoards), makeMoves, newBoards)
+    keys = [board.getKey() for board in bitBoards]
+    benchmarks["Machine.chooseMoves"] = (len(keys), lambda: machine.chooseMoves(keys), None)
+    benchmarks["Box.pickBead"] = (len(matchboxes), lambda: [matchbox.box.pickBead() for matchbox in matchboxes], None)
+    benchmarks["GameManager.playAgainstRandom"] = (1000, playGames, loadTrainingMachine)
+    benchmarks["getAllBoardsFrom"] = (20, lambda: [getAllBoardsFrom(emptyState) for i in range(20)], None)
+    benchmarks["loadMachine"] = (20, lambda: [loadMachine(MACHINE_PATH) for i in range(20)], None)
+    benchmarks["saveMachine"] = (20, lambda: [saveMachine(machine, savePath) for i in range(20)], None)
+    return benchmarks
+
+def runBenchmarks(names=None, repeats=9):
+    #The fastest of the repeats is the least disturbed by everything else on the machine
+    results = {}
+    for name, (calls, function, setup) in getBenchmarks().items():
+        if names and name not in names:
+            continue
+        times = []
+        for repeat in range(repeats):
+            if setup is not None:
+                setup()
+            random.seed(SEED)
+            startTime = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - startTime)
+        microseconds = min(times)/calls*1e6
+        results[name] = {"calls": calls, "usPerCall": float("{:.3g}".format(microseconds)), "perSecond": float("{:.3g}".format(1e6/microseconds))}
+    return results
+
+def compareResults(results, baseline, tolerance=0.5):
+    #Returns (name, ratio) for every benchmark more than tolerance slower than the baseline
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result["usPerCall"]/baseline[name]["usPerCall"]
+            if ratio > 1 + tolerance:
+                regressions.append((name, ratio))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the hot paths and compare them with a stored baseline.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="fraction slower than the baseline allowed")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    results = runBenchmarks(args.names, args.repeats)
+    print(json.dumps({"python": platform.python_version(), "results": results}, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compareResults(results, baseline, args.tolerance)
+        for name, ratio in regressions:
+            print("{} is {:.2f}x slower than the baseline.".format(name, ratio), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
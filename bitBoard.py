@@ -0,0 +1,139 @@
+from boardTables import Tile, CANONICAL_KEYS, CANONICAL_TRANSFORMS, UNIQUE_MOVES, formatBoard, getState, getMoveGrid
+
+FULL = 0b111111111
+
+WIN_MASKS = (0b000000111, 0b000111000, 0b111000000, #Rows
+             0b001001001, 0b010010010, 0b100100100, #Columns
+             0b100010001, 0b001010100)              #Diagonals
+
+IS_WINNING = bytes(any(mask & win == win for win in WIN_MASKS) for mask in range(512))
+MOVE_COUNTS = bytes(bin(mask).count("1") for mask in range(512))
+KEY_DIGITS = tuple(sum(3**cell for cell in range(9) if mask >> cell & 1) for mask in range(512)) #Base 3 key with a 1 for each set bit
+
+def getDigitMasks(digit): #Mask of the cells holding digit for every key, with keys split into the low 5 and high 4 cells
+    low = [sum(1 << cell for cell in range(5) if key // 3**cell % 3 == digit) for key in range(243)]
+    high = [sum(1 << cell for cell in range(5, 9) if key // 3**(cell-5) % 3 == digit) for key in range(81)]
+    return [highMask | lowMask for highMask in high for lowMask in low]
+
+NOUGHT_MASKS = getDigitMasks(1)
+CROSS_MASKS = getDigitMasks(2)
+
+class BitBoard:
+    __slots__ = ("noughts", "crosses", "symmetry")
+
+    def __init__(self, noughts=0, crosses=0):
+        self.noughts = noughts
+        self.crosses = crosses
+        self.symmetry = None
+
+    @classmethod
+    def fromKey(cls, key):
+        return cls(NOUGHT_MASKS[key], CROSS_MASKS[key])
+
+    @classmethod
+    def fromState(cls, state):
+        noughts = crosses = 0
+        for y in range(3):
+            for x in range(3):
+                if state[y][x] is Tile.Noughts:
+                    noughts |= 1 << (y*3 + x)
+                elif state[y][x] is Tile.Crosses:
+                    crosses |= 1 << (y*3 + x)
+        return cls(noughts, crosses)
+
+    @classmethod
+    def empty(cls):
+        return cls()
+
+    @property
+    def state(self):
+        return getState(self.getKey())
+
+    @property
+    def nextTurn(self):
+        return Tile.Noughts if MOVE_COUNTS[self.noughts] == MOVE_COUNTS[self.crosses] else Tile.Crosses
+
+    def __eq__(self, other):
+        return self.getKey() == other.getKey()
+
+    def __hash__(self):
+        return self.getKey()
+
+    def __getitem__(self, key):
+        return self.state[key]
+
+    def __getstate__(self):
+        return (self.noughts, self.crosses)
+
+    def __setstate__(self, state):
+        self.noughts, self.crosses = state
+        self.symmetry = None
+
+    def getKey(self):
+        return KEY_DIGITS[self.noughts] + 2*KEY_DIGITS[self.crosses]
+
+    def __str__(self):
+        return formatBoard(self.state)
+
+    def makeMove(self, bead):
+        bit = 1 << (bead[1]*3 + bead[0])
+        if MOVE_COUNTS[self.noughts] == MOVE_COUNTS[self.crosses]:
+            return BitBoard(self.noughts | bit, self.crosses)
+        return BitBoard(self.noughts, self.crosses | bit)
+
+    def getMoveCount(self):
+        return MOVE_COUNTS[self.noughts | self.crosses]
+
+    def getSymmetryInfo(self): #(canonical key, transform to it, unique move mask), looked up once per board
+        if self.symmetry is None:
+            key = self.getKey()
+            self.symmetry = (CANONICAL_KEYS[key], CANONICAL_TRANSFORMS[key], UNIQUE_MOVES[key])
+        return self.symmetry
+
+    def getUniqueMoveMask(self):
+        return self.getSymmetryInfo()[2]
+
+    def getUniqueMoves(self):
+        return getMoveGrid(self.getUniqueMoveMask())
+
+    def isValidMove(self, x, y):
+        return 0 <= x <= 2 and 0 <= y <= 2 and not (self.noughts | self.crosses) >> (y*3 + x) & 1
+
+    def isGameOver(self): # False or the winner (where Tile.Empty = draw)
+        if IS_WINNING[self.noughts]:
+            return Tile.Noughts
+        if IS_WINNING[self.crosses]:
+            return Tile.Crosses
+        if self.noughts | self.crosses == FULL:
+            return Tile.Empty
+        return False
+
+    def standardise(self):
+        canonicalKey = self.getSymmetryInfo()[0]
+        board = BitBoard.fromKey(canonicalKey)
+        board.symmetry = (canonicalKey, 0, UNIQUE_MOVES[canonicalKey]) #A canonical board is its own canonical board
+        return board
+
+if __name__ == "__main__":
+    # Microbenchmark: replay the same random games with each board backend
+    import random
+    import timeit
+    from machineLearningSimulation import Board
+
+    def playGame(board, moves):
+        for move in moves:
+            if board.isGameOver():
+                break
+            board.getMoveCount()
+            board = board.makeMove(move)
+        return board.isGameOver()
+
+    random.seed(0)
+    games = [random.sample([(x, y) for y in range(3) for x in range(3)], 9) for game in range(10000)]
+
+    timings = {}
+    for name, empty in (("Board", lambda: Board(getState(0))), ("BitBoard", BitBoard.empty)):
+        seconds = min(timeit.repeat(lambda: [playGame(empty(), moves) for moves in games], number=1, repeat=5))
+        timings[name] = seconds/len(games)*1e6
+        print("{:>8}: {:.2f} us/game".format(name, timings[name]))
+    print("Speedup: {:.1f}x".format(timings["Board"]/timings["BitBoard"]))
@@ -0,0 +1,262 @@
+from boardTables import Tile, TILES, TRANSFORM_CELLS, getCanonicalKey, getCanonicalTransform, getUniqueMoveMask
+import bitBoard
+
+#Keys, symmetries and wins for an n x n board where k in a row wins.
+#Boards are two bit masks (bit y*n+x for cell (x, y)) and keys are the base 3 encoding used for 3x3.
+
+def getTransformCells(size): #Same order as boardTables.getTransformations
+    def rotate90(b):
+        return [[b[size-1-x][y] for x in range(size)] for y in range(size)]
+
+    def flipH(b):
+        return b[::-1]
+
+    grid = [[y*size + x for x in range(size)] for y in range(size)]
+    transformations = [grid]
+    for i in range(3):
+        transformations.append(rotate90(transformations[-1]))
+    transformations.append(flipH(grid))
+    for i in range(3):
+        transformations.append(rotate90(transformations[-1]))
+    return [tuple(cell for row in transformed for cell in row) for transformed in transformations]
+
+def getWinMasks(size, winLength):
+    masks = []
+    for y in range(size):
+        for x in range(size):
+            for dx, dy in ((1, 0), (0, 1), (1, 1), (-1, 1)):
+                endX, endY = x + dx*(winLength-1), y + dy*(winLength-1)
+                if 0 <= endX < size and 0 <= endY < size:
+                    masks.append(sum(1 << ((y + dy*i)*size + x + dx*i) for i in range(winLength)))
+    return tuple(masks)
+
+def formatGrid(state):
+    def formatTile(t):
+        return " " if t is Tile.Empty else "X" if t is Tile.Crosses else "O"
+    return ("\n" + "+".join("-"*len(state)) + "\n").join("|".join(formatTile(t) for t in row) for row in state)
+
+class Geometry:
+    cacheSize = 1 << 20
+
+    def __init__(self, size=3, winLength=None):
+        self.size = size
+        self.winLength = size if winLength is None else winLength
+        self.cells = size*size
+        self.full = (1 << self.cells) - 1
+        self.transformCells = getTransformCells(size)
+        self.winMasks = getWinMasks(size, self.winLength)
+        self.canonicalCache = {}
+        self.buildChunks()
+
+    def buildChunks(self):
+        #Per byte of a mask: its contribution to the key, and its image under each transform
+        chunks = range((self.cells + 7) // 8)
+        self.keyChunks = [[sum(3**(8*chunk + bit) for bit in range(8) if byte >> bit & 1) for byte in range(256)] for chunk in chunks]
+        self.transformChunks = []
+        for transform in self.transformCells:
+            destinations = [0]*self.cells
+            for destination, source in enumerate(transform):
+                destinations[source] = destination
+            self.transformChunks.append([[sum(1 << destinations[8*chunk + bit] for bit in range(8) if byte >> bit & 1 and 8*chunk + bit < self.cells)
+                                          for byte in range(256)] for chunk in chunks])
+
+    def __reduce__(self):
+        return (getGeometry, (self.size, self.winLength))
+
+    def __repr__(self):
+        return "Geometry({}, {})".format(self.size, self.winLength)
+
+    def getKey(self, noughts, crosses):
+        key = 0
+        for chunk, table in enumerate(self.keyChunks):
+            key += table[noughts >> 8*chunk & 255] + 2*table[crosses >> 8*chunk & 255]
+        return key
+
+    def getMasks(self, key):
+        noughts = crosses = 0
+        for cell in range(self.cells):
+            key, digit = divmod(key, 3)
+            if digit == 1:
+                noughts |= 1 << cell
+            elif digit == 2:
+                crosses |= 1 << cell
+        return noughts, crosses
+
+    def getState(self, key):
+        tiles = []
+        for cell in range(self.cells):
+            key, digit = divmod(key, 3)
+            tiles.append(TILES[digit])
+        return [tiles[y*self.size:(y+1)*self.size] for y in range(self.size)]
+
+    def transformMask(self, mask, transform):
+        image = 0
+        for chunk, table in enumerate(self.transformChunks[transform]):
+            image |= table[mask >> 8*chunk & 255]
+        return image
+
+    def getSymmetryInfo(self, key): #(canonical key, transform to it, unique move mask), cached per key
+        info = self.canonicalCache.get(key)
+        if info is None:
+            noughts, crosses = self.getMasks(key)
+            images = [self.getKey(self.transformMask(noughts, t), self.transformMask(crosses, t)) for t in range(8)]
+            canonicalKey = min(images)
+
+            uniqueMoves = self.full & ~(noughts | crosses)
+            symmetries = [self.transformCells[t] for t in range(1, 8) if images[t] == key]
+            for cell in range(self.cells):
+                if uniqueMoves >> cell & 1 and any(transform[cell] < cell for transform in symmetries):
+                    uniqueMoves &= ~(1 << cell)
+
+            if len(self.canonicalCache) >= self.cacheSize:
+                self.canonicalCache.clear()
+            info = self.canonicalCache[key] = (canonicalKey, images.index(canonicalKey), uniqueMoves)
+        return info
+
+    def getCanonicalKey(self, key):
+        return self.getSymmetryInfo(key)[0]
+
+    def getCanonicalTransform(self, key):
+        return self.getSymmetryInfo(key)[1]
+
+    def getUniqueMoveMask(self, key):
+        return self.getSymmetryInfo(key)[2]
+
+    def isWinning(self, mask):
+        for win in self.winMasks:
+            if mask & win == win:
+                return True
+        return False
+
+    def getInitialBeads(self, moveCount): #2**(3-moveCount//2) on the 3x3 board
+        return 2**max(0, (self.cells - 1)//2 - 1 - moveCount//2)
+
+    def newBoard(self):
+        return GridBoard(self)
+
+class StandardGeometry(Geometry):
+    #The 3x3 game, answered from the precomputed tables
+    def __init__(self):
+        super().__init__(3, 3)
+        assert self.transformCells == TRANSFORM_CELLS
+
+    def buildChunks(self):
+        pass #Keys and masks come from the bitBoard tables instead
+
+    def getKey(self, noughts, crosses):
+        return bitBoard.KEY_DIGITS[noughts] + 2*bitBoard.KEY_DIGITS[crosses]
+
+    def getMasks(self, key):
+        return bitBoard.NOUGHT_MASKS[key], bitBoard.CROSS_MASKS[key]
+
+    def transformMask(self, mask, transform):
+        cells = TRANSFORM_CELLS[transform]
+        return sum(1 << cell for cell in range(9) if mask >> cells[cell] & 1)
+
+    def getSymmetryInfo(self, key):
+        return (getCanonicalKey(key), getCanonicalTransform(key), getUniqueMoveMask(key))
+
+    def getCanonicalKey(self, key):
+        return getCanonicalKey(key)
+
+    def getCanonicalTransform(self, key):
+        return getCanonicalTransform(key)
+
+    def getUniqueMoveMask(self, key):
+        return getUniqueMoveMask(key)
+
+    def isWinning(self, mask):
+        return bitBoard.IS_WINNING[mask]
+
+    def newBoard(self):
+        return bitBoard.BitBoard()
+
+STANDARD = StandardGeometry()
+KEY_LIMIT = 2**63 #Machines, machine files and checkpoints store keys as (at most) int64
+GEOMETRIES = {(3, 3): STANDARD}
+
+def getGeometry(size=3, winLength=None):
+    winLength = size if winLength is None else winLength
+    if 3**(size*size) > KEY_LIMIT:
+        raise ValueError("A {0}x{0} board's keys don't fit in 64 bits, so the largest board is 6x6".format(size))
+    if (size, winLength) not in GEOMETRIES:
+        GEOMETRIES[size, winLength] = Geometry(size, winLength)
+    return GEOMETRIES[size, winLength]
+
+class GridBoard:
+    #The BitBoard API for any Geometry
+    __slots__ = ("geometry", "noughts", "crosses", "symmetry")
+
+    def __init__(self, geometry, noughts=0, crosses=0):
+        self.geometry = geometry
+        self.noughts = noughts
+        self.crosses = crosses
+        self.symmetry = None
+
+    @classmethod
+    def fromKey(cls, geometry, key):
+        return cls(geometry, *geometry.getMasks(key))
+
+    @property
+    def state(self):
+        return self.geometry.getState(self.getKey())
+
+    @property
+    def nextTurn(self):
+        return Tile.Noughts if bin(self.noughts).count("1") == bin(self.crosses).count("1") else Tile.Crosses
+
+    def __eq__(self, other):
+        return self.getKey() == other.getKey()
+
+    def __hash__(self):
+        return self.getKey()
+
+    def __getitem__(self, key):
+        return self.state[key]
+
+    def getKey(self):
+        return self.geometry.getKey(self.noughts, self.crosses)
+
+    def __str__(self):
+        return formatGrid(self.state)
+
+    def makeMove(self, bead):
+        bit = 1 << (bead[1]*self.geometry.size + bead[0])
+        if bin(self.noughts).count("1") == bin(self.crosses).count("1"):
+            return GridBoard(self.geometry, self.noughts | bit, self.crosses)
+        return GridBoard(self.geometry, self.noughts, self.crosses | bit)
+
+    def getMoveCount(self):
+        return bin(self.noughts | self.crosses).count("1")
+
+    def getSymmetryInfo(self): #(canonical key, transform to it, unique move mask), looked up once per board
+        if self.symmetry is None:
+            self.symmetry = self.geometry.getSymmetryInfo(self.getKey())
+        return self.symmetry
+
+    def getUniqueMoveMask(self):
+        return self.getSymmetryInfo()[2]
+
+    def getUniqueMoves(self):
+        mask = self.getUniqueMoveMask()
+        size = self.geometry.size
+        return [[bool(mask >> (y*size + x) & 1) for x in range(size)] for y in range(size)]
+
+    def isValidMove(self, x, y):
+        size = self.geometry.size
+        return 0 <= x < size and 0 <= y < size and not (self.noughts | self.crosses) >> (y*size + x) & 1
+
+    def isGameOver(self): # False or the winner (where Tile.Empty = draw)
+        if self.geometry.isWinning(self.noughts):
+            return Tile.Noughts
+        if self.geometry.isWinning(self.crosses):
+            return Tile.Crosses
+        if self.noughts | self.crosses == self.geometry.full:
+            return Tile.Empty
+        return False
+
+    def standardise(self):
+        canonicalKey = self.getSymmetryInfo()[0]
+        board = GridBoard.fromKey(self.geometry, canonicalKey)
+        board.symmetry = (canonicalKey, 0, self.geometry.getUniqueMoveMask(canonicalKey))
+        return board
@@ -0,0 +1,151 @@
+import os
+from array import array
+from itertools import compress
+from operator import eq, lt
+from enum import Enum
+
+class Tile(Enum):
+    Empty = 0
+    Noughts = 1
+    Crosses = 2
+
+TILES = (Tile.Empty, Tile.Noughts, Tile.Crosses)
+STATE_COUNT = 3**9
+
+def flipH(b): #X axis flip (top/bottom)
+    return b[::-1]
+
+def rotate90(b):
+    return [[b[2][0],b[1][0],b[0][0]],
+            [b[2][1],b[1][1],b[0][1]],
+            [b[2][2],b[1][2],b[0][2]]]
+
+def getTransformations(b):
+    transformations = [b]
+    for i in range(3):
+        transformations.append(rotate90(transformations[-1]))
+    transformations.append(flipH(b))
+    for i in range(3):
+        transformations.append(rotate90(transformations[-1]))
+    return transformations
+
+def formatTile(t):
+    return " " if t is Tile.Empty else "X" if t is Tile.Crosses else "O"
+
+def formatBoard(b):
+    return "{}|{}|{}\n-+-+-\n{}|{}|{}\n-+-+-\n{}|{}|{}".format(*([formatTile(t) for t in b[0]]+[formatTile(t) for t in b[1]]+[formatTile(t) for t in b[2]]))
+
+def getStateKey(state): #Base 3 encoding of the tiles, read row by row
+    key = 0
+    for row in reversed(state):
+        for tile in reversed(row):
+            key = key*3 + tile.value
+    return key
+
+def getState(key):
+    tiles = []
+    for cell in range(9):
+        key, digit = divmod(key, 3)
+        tiles.append(TILES[digit])
+    return [tiles[0:3], tiles[3:6], tiles[6:9]]
+
+def getMoveGrid(mask):
+    return [[bool(mask >> (y*3 + x) & 1) for x in range(3)] for y in range(3)]
+
+# TRANSFORM_CELLS[t][i] is the cell of the original board that ends up at cell i
+# after applying the t-th entry of getTransformations
+TRANSFORM_CELLS = [tuple(cell for row in transformed for cell in row)
+                   for transformed in getTransformations([[0, 1, 2], [3, 4, 5], [6, 7, 8]])]
+IDENTITY = 0
+
+def buildTables():
+    # Split keys into the low 5 and high 4 cells so each transform is two small lookups
+    def partialImages(cells, offset):
+        images = []
+        for transform in TRANSFORM_CELLS:
+            destination = [0]*9
+            for i, source in enumerate(transform):
+                destination[source] = i
+            weights = [3**destination[offset + cell] for cell in range(cells)]
+            table = []
+            for key in range(3**cells):
+                image = 0
+                for weight in weights:
+                    key, digit = divmod(key, 3)
+                    image += digit*weight
+                table.append(image)
+            images.append(table)
+        return images
+
+    lowImages = partialImages(5, 0)
+    highImages = partialImages(4, 5)
+    images = [[highImage + lowImage for highImage in high for lowImage in low] #Key order: high*243 + low
+              for low, high in zip(lowImages, highImages)]
+
+    # Only a strictly smaller image replaces the best so far, so ties keep the earliest transform
+    canonicalKeys = array("i", images[0])
+    canonicalTransforms = array("b", bytes(STATE_COUNT))
+    for t in range(1, 8):
+        image = images[t]
+        for key in compress(range(STATE_COUNT), map(lt, image, canonicalKeys)):
+            canonicalKeys[key] = image[key]
+            canonicalTransforms[key] = t
+
+    lowEmpty = [sum(1 << cell for cell in range(5) if key // 3**cell % 3 == 0) for key in range(243)]
+    highEmpty = [sum(1 << (cell + 5) for cell in range(4) if key // 3**cell % 3 == 0) for key in range(81)]
+    uniqueMoves = array("H", [high | low for high in highEmpty for low in lowEmpty])
+
+    # A key left unchanged by a transform keeps only the first cell of each orbit of empty cells
+    for t in range(1, 8):
+        repeated = ~sum(1 << cell for cell in range(9) if TRANSFORM_CELLS[t][cell] < cell)
+        for key in compress(range(STATE_COUNT), map(eq, images[t], range(STATE_COUNT))):
+            uniqueMoves[key] &= repeated
+
+    return canonicalKeys, canonicalTransforms, uniqueMoves
+
+# Building the tables takes most of the time it takes to import this module, so they're kept in
+# a cache file next to it, and only built (and the cache rewritten) when that is missing or stale
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "boardTables.cache")
+CACHE_MAGIC = b"NACTAB1\0" #Change this whenever buildTables does, so old caches are rebuilt
+
+def loadTables(path=CACHE_PATH):
+    tables = array("i"), array("b"), array("H")
+    try:
+        with open(path, "rb") as file:
+            if file.read(len(CACHE_MAGIC)) == CACHE_MAGIC:
+                for table in tables:
+                    table.fromfile(file, STATE_COUNT)
+                if not file.read(1):
+                    return tables
+    except (OSError, EOFError):
+        pass
+
+    tables = buildTables()
+    temporaryPath = "{}.{}.tmp".format(path, os.getpid()) #Processes starting together don't write over each other
+    try:
+        with open(temporaryPath, "wb") as file:
+            file.write(CACHE_MAGIC)
+            for table in tables:
+                table.tofile(file)
+        os.replace(temporaryPath, path)
+    except OSError: #A read-only install just builds the tables every time
+        pass
+    return tables
+
+CANONICAL_KEYS, CANONICAL_TRANSFORMS, UNIQUE_MOVES = loadTables()
+
+def getCanonicalKey(key):
+    return CANONICAL_KEYS[key]
+
+def getCanonicalTransform(key):
+    return CANONICAL_TRANSFORMS[key]
+
+def getUniqueMoveMask(key):
+    return UNIQUE_MOVES[key]
+
+def getCallerMove(key, canonicalCell): #Cell on the board with this key that matches a cell on its canonical board
+    return TRANSFORM_CELLS[CANONICAL_TRANSFORMS[key]][canonicalCell]
+
+def transformCells(values, transform): #Reorders 9 per-cell values the same way a board is transformed
+    cells = TRANSFORM_CELLS[transform]
+    return [values[cells[i]] for i in range(9)]
@@ -1,166 +1,147 @@
+import csv
 import json
-from enum import Enum
-
-class Tile(Enum):
-    Empty = 0
-    Noughts = 1
-    Crosses = 2
-
-def flipH(b): #X axis flip (top/bottom)
-    return b[::-1]
-
-def flipV(b): #Y axis flip (left/right)
-    return [b[0][::-1],b[1][::-1],b[2][::-1]]
-
-def rotate90(b):
-    return [[b[2][0],b[1][0],b[0][0]],
-            [b[2][1],b[1][1],b[0][1]],
-            [b[2][2],b[1][2],b[0][2]]]
-
-def rotate180(b):
-    return rotate90(rotate90(b))
-
-def rotate270(b):
-    return rotate90(rotate90(rotate90(b)))
-
-def getTransformations(b):
-    return [b, rotate90(b), rotate180(b), rotate270(b),
-            flipH(b), rotate90(flipH(b)), rotate180(flipH(b)), rotate270(flipH(b))]
-
-def isWinningState(b):
-    return b[0][0]==b[0][1]==b[0][2]!=Tile.Empty or\
-           b[1][0]==b[1][1]==b[1][2]!=Tile.Empty or\
-           b[2][0]==b[2][1]==b[2][2]!=Tile.Empty or\
-           b[0][0]==b[1][0]==b[2][0]!=Tile.Empty or\
-           b[0][1]==b[1][1]==b[2][1]!=Tile.Empty or\
-           b[0][2]==b[1][2]==b[2][2]!=Tile.Empty or\
-           b[0][0]==b[1][1]==b[2][2]!=Tile.Empty or\
-           b[2][0]==b[1][1]==b[0][2]!=Tile.Empty
-
-def printBoard(b):
-    def formatTile(t):
-        return " " if t is Tile.Empty else "X" if t is Tile.Crosses else "O"
-    print("{}|{}|{}\n-+-+-\n{}|{}|{}\n-+-+-\n{}|{}|{}\n".format(*([formatTile(t) for t in b[0]]+[formatTile(t) for t in b[1]]+[formatTile(t) for t in b[2]])))
-
-def getAllBoardsFrom(startBoard):
-    def getNextBoards(b, turn):
-        for y in range(3):
-            for x in range(3):
-                if b[y][x] is Tile.Empty:
-                    newBoard = [[tile for tile in row] for row in b]
-                    newBoard[y][x] = turn
-                    for boardTransformation in getTransformations(newBoard):
-                        if boardTransformation in boards:
-                            break
-                    else:
-                        if not isWinningState(newBoard):
-                            boards.append(newBoard)
-                            getNextBoards(newBoard, Tile.Noughts if turn is Tile.Crosses else Tile.Crosses)
-
-    boards = [startBoard]
-    getNextBoards(startBoard, Tile.Noughts)
-    return boards
-
-def removeOddTurns(boards):
-    evenBoards = []
-    for b in boards:
-        c = 0
-        for y in range(3):
-            for x in range(3):
-                if b[y][x] is not Tile.Empty:
-                    c += 1
-        if c in (0, 2, 4, 6):
-            evenBoards.append(b)
-    return evenBoards
-                    
+from collections import defaultdict
+
+from bitBoard import MOVE_COUNTS, NOUGHT_MASKS, CROSS_MASKS
+
+#Groups 3x3 states by where their tiles are. The states are an array of board keys, optionally
+#weighted (visits from a game log, or beads from a machine), and each feature is worked out for the
+#whole array at once, with one lookup per key into a table of the feature over every board key.
+CORNERS = 0b101000101
+EDGES = 0b010101010
+CENTRE = 0b000010000
+OPPOSITE_CORNERS = (0b100000001, 0b001000100)
+
+def getCornerPair(noughts, crosses): #For boards with exactly two corners taken, whether they are opposite or adjacent
+    corners = (noughts | crosses) & CORNERS
+    return "opposite" if corners in OPPOSITE_CORNERS else "adjacent" if MOVE_COUNTS[corners] == 2 else "-"
+
+FEATURES = { #Feature name to its value given the noughts and crosses masks
+    "moves": lambda noughts, crosses: MOVE_COUNTS[noughts | crosses],
+    "turn": lambda noughts, crosses: "O" if MOVE_COUNTS[noughts] == MOVE_COUNTS[crosses] else "X",
+    "corners": lambda noughts, crosses: MOVE_COUNTS[(noughts | crosses) & CORNERS],
+    "edges": lambda noughts, crosses: MOVE_COUNTS[(noughts | crosses) & EDGES],
+    "centre": lambda noughts, crosses: "O" if noughts & CENTRE else "X" if crosses & CENTRE else " ",
+    "cornerNoughts": lambda noughts, crosses: MOVE_COUNTS[noughts & CORNERS],
+    "cornerCrosses": lambda noughts, crosses: MOVE_COUNTS[crosses & CORNERS],
+    "edgeNoughts": lambda noughts, crosses: MOVE_COUNTS[noughts & EDGES],
+    "edgeCrosses": lambda noughts, crosses: MOVE_COUNTS[crosses & EDGES],
+    "cornerPair": getCornerPair,
+}
+FEATURE_TABLES = {}
+
+def getFeatureColumn(feature, keys): #The feature's value for each of the keys
+    if feature not in FEATURES:
+        raise ValueError("Unknown feature {}, pick from {}".format(feature, ", ".join(FEATURES)))
+    if feature not in FEATURE_TABLES:
+        FEATURE_TABLES[feature] = list(map(FEATURES[feature], NOUGHT_MASKS, CROSS_MASKS))
+    return list(map(FEATURE_TABLES[feature].__getitem__, keys))
+
+def groupStates(keys, groupBy, weights=None, weightName="weight", where=None):
+    #keys: board keys, e.g. an array("i"), weights: a number for each key
+    #where: feature name to the values (as strings) a state needs to be counted
+    #Returns a row for each group: the feature values, the number of states and their total weight
+    where = where or {}
+    columns = {feature: getFeatureColumn(feature, keys) for feature in set(groupBy) | set(where)}
+    included = range(len(keys))
+    for feature, values in where.items():
+        column = columns[feature]
+        included = [index for index in included if str(column[index]) in values]
+
+    groups = defaultdict(lambda: [0, 0])
+    groupColumns = [columns[feature] for feature in groupBy]
+    for index in included:
+        group = groups[tuple(column[index] for column in groupColumns)]
+        group[0] += 1
+        if weights is not None:
+            group[1] += weights[index]
+
+    rows = []
+    for values in sorted(groups, key=lambda values: [str(value) for value in values]):
+        row = dict(zip(groupBy, values))
+        row["states"] = groups[values][0]
+        if weights is not None:
+            row[weightName] = groups[values][1]
+        rows.append(row)
+    return rows
+
+def getStateTable(): #Every 3x3 state in play, as an array of canonical keys
+    from machineLearningSimulation import getStateIndex
+
+    return getStateIndex()[0]
+
+def getBeadTable(machine): #A machine's states and the beads in each
+    from boardGeometry import STANDARD
+
+    if machine.geometry is not STANDARD:
+        raise ValueError("Only 3x3 machines can be categorised, not {}".format(machine.geometry))
+    return machine.stateKeys, machine.beadTotals
+
+def getVisitTable(path): #The states moves were played from in a game log, and how often
+    from boardGeometry import STANDARD
+    from gameLog import getPositions, readGames
+
+    games = readGames(path)
+    geometry = next(games)
+    if geometry is not STANDARD:
+        raise ValueError("Only 3x3 game logs can be categorised, not {}".format(geometry))
+    visits = defaultdict(int)
+    for moves, result, machineStarted in games:
+        for canonicalKey in getPositions(geometry, moves):
+            visits[canonicalKey] += 1
+    return list(visits), list(visits.values())
+
+def writeRows(rows, file, format="json"):
+    if format == "json":
+        json.dump(rows, file, indent=4)
+        file.write("\n")
+    else:
+        writer = csv.DictWriter(file, list(rows[0]) if rows else ["states"], lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
 
 if __name__ == "__main__":
-    boards = getAllBoardsFrom([[Tile.Empty,Tile.Empty,Tile.Empty],[Tile.Empty,Tile.Empty,Tile.Empty],[Tile.Empty,Tile.Empty,Tile.Empty]])
-
-    boards = removeOddTurns(boards)
-    mode = 0
-    check2 = False
-    check1and3 = False
-    
-    if mode == 0:
-        groups = {str(key):{key1:{str(key2):0 for key2 in range(5)} for key1 in ('X','O',' ')} for key in range(0,7,2)}
-        if check2:
-            groups['X']['2'] = {"Opp" : 0, "Adj" : 0}
-            groups['O']['2'] = {"Opp" : 0, "Adj" : 0}
-            groups[' ']['2'] = {"Opp" : 0, "Adj" : 0}
-        if check1and3:
-            groups['X']['1'] = {"X" : 0, "O" : 0}
-            groups['O']['1'] = {"X" : 0, "O" : 0}
-            groups[' ']['1'] = {"X" : 0, "O" : 0}
-            groups['X']['3'] = {"X" : 0, "O" : 0}
-            groups['O']['3'] = {"X" : 0, "O" : 0}
-            groups[' ']['3'] = {"X" : 0, "O" : 0}
-        
-        for b in boards:
-            c = 0
-            if b[0][0] is not Tile.Empty: c += 1
-            if b[2][0] is not Tile.Empty: c += 1
-            if b[0][2] is not Tile.Empty: c += 1
-            if b[2][2] is not Tile.Empty: c += 1
-
-            e = 0
-            if b[1][0] is not Tile.Empty: e += 1
-            if b[1][2] is not Tile.Empty: e += 1
-            if b[0][1] is not Tile.Empty: e += 1
-            if b[2][1] is not Tile.Empty: e += 1
-
-            m = 0
-            if b[1][1] is not Tile.Empty: m += 1
-
-            if c == 2 and check2:
-                if b[0][0] is not Tile.Empty and b[2][2] is not Tile.Empty or b[2][0] is not Tile.Empty and b[0][2] is not Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['2']["Opp"] += 1
-                else:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['2']["Adj"] += 1
-            elif c == 1 and check1and3:
-                if b[0][0] is not Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[0][0] is Tile.Noughts else 'X'] += 1
-                if b[2][0] is not Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[2][0] is Tile.Noughts else 'X'] += 1
-                if b[0][2] is not Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[0][2] is Tile.Noughts else 'X'] += 1
-                if b[2][2] is not Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[2][2] is Tile.Noughts else 'X'] += 1
-            elif c == 3 and check1and3:
-                if b[0][0] is Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[2][2] is Tile.Noughts else 'X'] += 1
-                if b[2][0] is Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[0][2] is Tile.Noughts else 'X'] += 1
-                if b[0][2] is Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[2][0] is Tile.Noughts else 'X'] += 1
-                if b[2][2] is Tile.Empty:
-                    groups[' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X']['1']['O' if b[0][0] is Tile.Noughts else 'X'] += 1
-            else:
-                groups[str(c+e+m)][' ' if b[1][1] is Tile.Empty else 'O' if b[1][1] is Tile.Noughts else 'X'][str(c)] += 1
-            
-    elif mode == 1:
-        groups = {}
-        for b in boards:
-            s = 0
-            if b[1][0] is not Tile.Empty: s += 1
-            if b[1][2] is not Tile.Empty: s += 1
-            if b[0][1] is not Tile.Empty: s += 1
-            if b[2][1] is not Tile.Empty: s += 1
-            if b[1][1] is not Tile.Empty: s += 5
-            if str(s) in groups:
-                groups[str(s)]+=1
-            else:
-                groups[str(s)]=1
-
-    toDelete = []
-    for key in groups:
-        for key2 in groups[key]:
-            for key3 in groups[key][key2]:
-                if groups[key][key2][key3] == 0:
-                    toDelete.append((key, key2, key3))
-    for key, key2, key3 in toDelete:
-        del groups[key][key2][key3]
-    del groups["0"]["O"]
-    del groups["0"]["X"]
-    print(json.dumps(groups, indent=4, sort_keys=True))
-            
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Count 3x3 states grouped by where their tiles are.")
+    parser.add_argument("--group-by", default="moves,centre,corners", help="comma separated features from: " + ", ".join(FEATURES))
+    parser.add_argument("--where", action="append", default=[], help="only count states with these values, e.g. moves=0,2,4,6")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--machine", help="weight states by their beads in this machine (.pickle or machine file)")
+    source.add_argument("--log", help="count the states moves were played from in this game log")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--output", help="file to write (default: standard output)")
+    args = parser.parse_args()
+
+    if args.machine is not None:
+        if args.machine.endswith(".pickle"):
+            from machineLearningSimulation import loadMachine
+            machine = loadMachine(args.machine)
+        else:
+            from machineFile import loadMachineFile
+            machine = loadMachineFile(args.machine)
+        keys, weights = getBeadTable(machine)
+        weightName = "beads"
+    elif args.log is not None:
+        keys, weights = getVisitTable(args.log)
+        weightName = "visits"
+    else:
+        keys, weights, weightName = getStateTable(), None, None
+
+    try:
+        where = {}
+        for condition in args.where:
+            feature, equals, values = condition.partition("=")
+            if not equals:
+                raise ValueError("--where needs a feature and its values, e.g. moves=0,2,4,6, not {}".format(condition))
+            where[feature] = values.split(",")
+        rows = groupStates(keys, [feature for feature in args.group_by.split(",") if feature], weights, weightName, where)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.output is None:
+        writeRows(rows, sys.stdout, args.format)
+    else:
+        with open(args.output, "w", newline="") as file:
+            writeRows(rows, file, args.format)
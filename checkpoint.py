@@ -0,0 +1,105 @@
+import logging
+import os
+import struct
+import time
+import zlib
+from array import array
+
+from machineFile import loadMachineFile, saveMachineFile
+
+#A checkpoint is a machine file snapshot plus a delta log next to it (path + ".log").
+#Each checkpoint appends one block to the log: a header with the record count and a crc32
+#of the records, then one record per changed state holding its int64 key and its bead counts.
+#Records hold absolute counts, so replaying a block twice is harmless, and a block cut
+#short by a crash fails its checksum and is ignored with everything after it.
+BLOCK_HEADER = struct.Struct("<II")
+
+def getRecord(machine):
+    return struct.Struct("<q{}i".format(machine.cells))
+
+def getLogPath(path):
+    return path + ".log"
+
+def writeSnapshot(machine, path):
+    temporaryPath = path + ".tmp"
+    saveMachineFile(machine, temporaryPath)
+    with open(temporaryPath, "rb+") as file:
+        os.fsync(file.fileno())
+    os.replace(temporaryPath, path)
+
+def readLogBlocks(path, record):
+    try:
+        with open(getLogPath(path), "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return
+
+    offset = 0
+    while offset + BLOCK_HEADER.size <= len(data):
+        recordCount, checksum = BLOCK_HEADER.unpack_from(data, offset)
+        payload = data[offset+BLOCK_HEADER.size:offset+BLOCK_HEADER.size+recordCount*record.size]
+        if len(payload) != recordCount*record.size or zlib.crc32(payload) != checksum:
+            logging.warning("Ignoring incomplete checkpoint log block at byte {}.".format(offset))
+            return
+        yield [record.unpack_from(payload, index*record.size) for index in range(recordCount)]
+        offset += BLOCK_HEADER.size + len(payload)
+
+def loadCheckpoint(path):
+    #The snapshot with every complete log block applied, or None if there is no checkpoint
+    if not os.path.exists(path):
+        return None
+
+    machine = loadMachineFile(path)
+    cells = machine.cells
+    for records in readLogBlocks(path, getRecord(machine)):
+        for key, *beads in records:
+            stateId = machine.getStateId(key)
+            machine.beads[stateId*cells:(stateId+1)*cells] = array("i", beads)
+            machine.updateCumulativeBeads(stateId)
+    machine.changedStates.clear()
+    return machine
+
+class Checkpointer:
+    def __init__(self, machine, path, everyGames=None, everySeconds=None, compactBytes=1 << 20):
+        self.machine = machine
+        self.path = path
+        self.everyGames = everyGames
+        self.everySeconds = everySeconds
+        self.compactBytes = compactBytes
+
+        self.gamesSinceCheckpoint = 0
+        self.lastCheckpointTime = time.time()
+        self.compact()
+
+    def gamePlayed(self, games=1):
+        self.gamesSinceCheckpoint += games
+        if self.everyGames is not None and self.gamesSinceCheckpoint >= self.everyGames or\
+           self.everySeconds is not None and time.time() - self.lastCheckpointTime >= self.everySeconds:
+            self.checkpoint()
+
+    def checkpoint(self):
+        machine = self.machine
+        record, cells = getRecord(machine), machine.cells
+        payload = b"".join(record.pack(machine.stateKeys[stateId], *machine.beads[stateId*cells:(stateId+1)*cells]) for stateId in sorted(machine.changedStates))
+        with open(getLogPath(self.path), "ab") as file:
+            file.write(BLOCK_HEADER.pack(len(machine.changedStates), zlib.crc32(payload)) + payload)
+            file.flush()
+            os.fsync(file.fileno())
+            logSize = file.tell()
+        logging.debug("Checkpointed {} changed states after {} games.".format(len(machine.changedStates), self.gamesSinceCheckpoint))
+
+        machine.changedStates.clear()
+        self.gamesSinceCheckpoint = 0
+        self.lastCheckpointTime = time.time()
+        if logSize >= self.compactBytes:
+            self.compact()
+
+    def compact(self):
+        #Fold the log into a new snapshot; a crash before the log is removed just replays it again
+        writeSnapshot(self.machine, self.path)
+        try:
+            os.remove(getLogPath(self.path))
+        except FileNotFoundError:
+            pass
+        self.machine.changedStates.clear()
+        logging.debug("Compacted checkpoint into {}.".format(self.path))
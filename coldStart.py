@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+#Time for a fresh process to import machineLearningSimulation, load a machine and make its first move,
+#not counting the interpreter's own start up, as a multiple of the time the same process takes just to
+#import the standard library modules it uses, so the budget means the same on a slow machine as a fast one
+BUDGET_RATIO = 3
+
+REFERENCE = """
+import json, time
+start = time.perf_counter()
+import array, bisect, enum, itertools, logging, operator, os, pickle, random
+print(json.dumps({"reference": (time.perf_counter() - start)*1000}))
+"""
+
+PLAYER = """
+import json, sys, time
+start = time.perf_counter()
+import machineLearningSimulation
+imported = time.perf_counter()
+machine = machineLearningSimulation.loadMachine(sys.argv[1])
+loaded = time.perf_counter()
+machine.makeMove(machineLearningSimulation.BitBoard())
+moved = time.perf_counter()
+print(json.dumps({"import": (imported - start)*1000, "load": (loaded - imported)*1000, "move": (moved - loaded)*1000, "total": (moved - start)*1000}))
+"""
+
+def measureColdStart(machinePath="trainedMachine.pickle", runs=5):
+    #Median of each step, and of the reference, over runs fresh processes, in milliseconds
+    directory = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (directory, os.environ.get("PYTHONPATH")))))
+    environment.pop("PYTHONDONTWRITEBYTECODE", None) #A player that's run more than once has its bytecode cached
+    results = []
+    for run in range(runs + 1): #The first run only warms the disk, bytecode and table caches
+        result = {}
+        for script, arguments in ((REFERENCE, []), (PLAYER, [machinePath])):
+            output = subprocess.run([sys.executable, "-c", script] + arguments, env=environment, check=True, capture_output=True, text=True).stdout
+            result.update(json.loads(output))
+        results.append(result)
+    return {step: statistics.median(result[step] for result in results[1:]) for step in results[0]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold start of a process that plays a trained machine.")
+    parser.add_argument("--machine", default="trainedMachine.pickle")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=BUDGET_RATIO, help="total time allowed, as a multiple of the reference")
+    args = parser.parse_args()
+
+    times = measureColdStart(args.machine, args.runs)
+    print(", ".join("{} {:.1f} ms".format(step, milliseconds) for step, milliseconds in times.items()))
+    ratio = times["total"]/times["reference"]
+    print("{:.2f} times the reference, budget {:.2f}.".format(ratio, args.budget))
+    if ratio > args.budget:
+        print("Over the budget.")
+        sys.exit(1)
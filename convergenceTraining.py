@@ -0,0 +1,189 @@
+import logging
+import random
+import time
+from array import array
+from collections import defaultdict, deque
+
+from boardGeometry import STANDARD
+from boardTables import Tile
+
+#Trains a machine against a random player until its play stops changing. Every checkGames games the
+#bead distributions of the states played since the last check are compared with how they were then,
+#and the loss rate over the last window games is kept as a running count. Once both are under their
+#thresholds for patience checks in a row, training moves on to the next (win, draw, lose) deltas, or
+#stops after the last ones.
+LOSS_LEVELS = (0.05, 0.02, 0.01, 0.005) #Rolling loss rates
+OPTIMAL_LEVELS = (90.0, 95.0, 98.0) #Percentages of beads on optimal moves (3x3 only, see minimax.py)
+
+class ConvergenceTrainer:
+    def __init__(self, machine, deltaStages=((1, 0, -10),), checkGames=5000, window=5000, changeThreshold=0.005,
+                 lossThreshold=0.01, patience=3, lossLevels=LOSS_LEVELS, optimalLevels=OPTIMAL_LEVELS):
+        self.machine = machine
+        self.deltaStages = list(deltaStages)
+        self.checkGames = checkGames
+        self.changeThreshold = changeThreshold
+        self.lossThreshold = lossThreshold
+        self.patience = patience
+        self.optimalLevels = optimalLevels if machine.geometry is STANDARD else ()
+
+        self.stage = 0
+        self.gamesPlayed = 0
+        self.calmChecks = 0 #Checks in a row under both thresholds
+        self.results = deque(maxlen=window) #Whether each game in the window was lost
+        self.losses = 0
+        self.visits = defaultdict(int) #State id to the times the machine moved there since the last check
+        self.previousBeads = array("i", machine.beads)
+        self.previousTotals = array("i", machine.beadTotals)
+        self.levelGames = {("loss", level): None for level in lossLevels}
+        self.levelGames.update((("optimal", level), None) for level in self.optimalLevels)
+        self.stageGames = []
+
+    @property
+    def deltas(self):
+        return self.deltaStages[self.stage]
+
+    def playGame(self, rng=random):
+        from machineLearningSimulation import GameManager
+
+        machine = self.machine
+        machineStart = self.gamesPlayed % 2 == 0
+        result = GameManager.playAgainstRandom(machine, machineStart, True, *self.deltas, rng=rng)
+        for stateId, cell in machine.moves:
+            self.visits[stateId] += 1
+
+        lost = result is (Tile.Crosses if machineStart else Tile.Noughts)
+        if len(self.results) == self.results.maxlen:
+            self.losses -= self.results[0]
+        self.results.append(lost)
+        self.losses += lost
+        self.gamesPlayed += 1
+
+    def getLossRate(self): #None until the window is full
+        return self.losses/len(self.results) if len(self.results) == self.results.maxlen else None
+
+    def getPolicyChange(self):
+        #Visit weighted mean total variation distance between the bead distributions of the states
+        #played since the last check and those same states at the last check
+        machine = self.machine
+        beads, beadTotals, cells = machine.beads, machine.beadTotals, machine.cells
+        previousBeads, previousTotals = self.previousBeads, self.previousTotals
+        newStates = len(beadTotals) - len(previousTotals) #Added by a lazy machine
+        if newStates:
+            previousBeads.frombytes(bytes(newStates*cells*4))
+            previousTotals.frombytes(bytes(newStates*4))
+
+        change = visits = 0
+        for stateId, count in self.visits.items():
+            offset = stateId*cells
+            total, previousTotal = beadTotals[stateId], previousTotals[stateId]
+            if not previousTotal: #A new state has changed completely
+                distance = 1.0
+            else:
+                distance = sum(abs(beads[index]/total - previousBeads[index]/previousTotal) for index in range(offset, offset+cells))/2
+            change += count*distance
+            visits += count
+            previousBeads[offset:offset+cells] = beads[offset:offset+cells]
+            previousTotals[stateId] = total
+        self.visits.clear()
+        return change/visits if visits else 0.0
+
+    def updateLevels(self, lossRate):
+        optimalMass = None
+        if self.optimalLevels:
+            from minimax import evaluateMachine
+
+            optimalMass = evaluateMachine(self.machine)["optimalMass"]
+        for (measure, level), games in self.levelGames.items():
+            if games is None:
+                if measure == "loss" and lossRate is not None and lossRate <= level or measure == "optimal" and optimalMass >= level:
+                    self.levelGames[measure, level] = self.gamesPlayed
+                    logging.info("Reached {} after {} games.".format(formatLevel(measure, level), self.gamesPlayed))
+        return optimalMass
+
+    def check(self):
+        #Returns True once the last stage has converged
+        change = self.getPolicyChange()
+        lossRate = self.getLossRate()
+        optimalMass = self.updateLevels(lossRate)
+        logging.info("{} games, deltas {}: policy change {:.4f}, loss rate {}{}.".format(
+            self.gamesPlayed, ",".join(map(str, self.deltas)), change, "-" if lossRate is None else "{:.2%}".format(lossRate),
+            "" if optimalMass is None else ", {:.1f}% of beads on optimal moves".format(optimalMass)))
+
+        calm = change <= self.changeThreshold and lossRate is not None and lossRate <= self.lossThreshold
+        self.calmChecks = self.calmChecks + 1 if calm else 0
+        if self.calmChecks < self.patience:
+            return False
+
+        self.stageGames.append(self.gamesPlayed)
+        logging.info("Deltas {} converged after {} games.".format(",".join(map(str, self.deltas)), self.gamesPlayed))
+        if self.stage == len(self.deltaStages) - 1:
+            return True
+        self.stage += 1
+        self.calmChecks = 0
+        return False
+
+    def train(self, maxGames=None, rng=random):
+        #Runs until the last stage converges, maxGames games have been played or Ctrl-C.
+        #Returns why it stopped: "converged", "budget" or "interrupted".
+        try:
+            while maxGames is None or self.gamesPlayed < maxGames:
+                self.playGame(rng)
+                if self.gamesPlayed % self.checkGames == 0 and self.check():
+                    return "converged"
+            return "budget"
+        except KeyboardInterrupt:
+            return "interrupted"
+
+    def getReport(self):
+        return {"games": self.gamesPlayed, "stage": self.stage, "stageGames": list(self.stageGames), "lossRate": self.getLossRate(),
+                "levels": {formatLevel(measure, level): games for (measure, level), games in self.levelGames.items()}}
+
+def formatLevel(measure, level):
+    return "loss rate <= {:.1%}".format(level) if measure == "loss" else "{:.0f}% of beads on optimal moves".format(level)
+
+if __name__ == "__main__":
+    import argparse
+
+    from boardGeometry import getGeometry
+    from machineLearningSimulation import Machine, loadMachine, saveMachine
+
+    logging.basicConfig(level=logging.INFO)
+
+    def parseDeltas(text):
+        return tuple(int(value) for value in text.split(","))
+
+    parser = argparse.ArgumentParser(description="Train a machine against a random player until its play converges.")
+    parser.add_argument("--machine", default="trainedMachine.pickle", help="pickle file the machine is loaded from and saved to")
+    parser.add_argument("--size", type=int, default=3, help="board size for a new machine")
+    parser.add_argument("--win-length", type=int, help="tiles in a row needed to win for a new machine (default: size)")
+    parser.add_argument("--deltas", type=parseDeltas, action="append", help="win,draw,lose bead changes of a stage, in order (default: 1,0,-10)")
+    parser.add_argument("--max-games", type=int, help="stop after this many games even if training hasn't converged")
+    parser.add_argument("--check-games", type=int, default=5000, help="games between convergence checks")
+    parser.add_argument("--window", type=int, default=5000, help="games the loss rate is measured over")
+    parser.add_argument("--change", type=float, default=0.005, help="policy change a check has to be under")
+    parser.add_argument("--loss", type=float, default=0.01, help="loss rate a check has to be under")
+    parser.add_argument("--patience", type=int, default=3, help="checks in a row under both thresholds for a stage to converge")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    try:
+        geometry = getGeometry(args.size, args.win_length) #For a new machine
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        machine = loadMachine(args.machine)
+        logging.info("Loaded machine from pickle file.")
+    except FileNotFoundError:
+        logging.info("Could not find pickle file, so creating a blank machine.")
+        machine = Machine(geometry)
+
+    trainer = ConvergenceTrainer(machine, args.deltas or [(1, 0, -10)], args.check_games, args.window, args.change, args.loss, args.patience)
+    startTime = time.time()
+    reason = trainer.train(args.max_games, random.Random(args.seed))
+    seconds = time.time() - startTime
+    logging.info("Stopped training ({}) after {} games in {:.1f} seconds.".format(reason, trainer.gamesPlayed, seconds))
+    for level, games in trainer.getReport()["levels"].items():
+        logging.info("{}: {}".format(level, "not reached" if games is None else "{} games".format(games)))
+
+    saveMachine(machine, args.machine)
+    logging.info("Saved machine to {}.".format(args.machine))
@@ -1,66 +1,53 @@
 import pickle
-import json
-from enum import Enum
+import logging
+import time
 
-class Tile(Enum):
-    Empty = 0
-    Noughts = 1
-    Crosses = 2
+from boardGeometry import STANDARD
+from boardTables import Tile, getStateKey, getState
 
-def flipH(b): #X axis flip (top/bottom)
-    return b[::-1]
-
-def flipV(b): #Y axis flip (left/right)
-    return [b[0][::-1],b[1][::-1],b[2][::-1]]
-
-def rotate90(b):
-    return [[b[2][0],b[1][0],b[0][0]],
-            [b[2][1],b[1][1],b[0][1]],
-            [b[2][2],b[1][2],b[0][2]]]
-
-def rotate180(b):
-    return rotate90(rotate90(b))
-
-def rotate270(b):
-    return rotate90(rotate90(rotate90(b)))
-
-def getTransformations(b):
-    return [b, rotate90(b), rotate180(b), rotate270(b),
-            flipH(b), rotate90(flipH(b)), rotate180(flipH(b)), rotate270(flipH(b))]
-
-def isWinningState(b):
-    return b[0][0]==b[0][1]==b[0][2]!=Tile.Empty or\
-           b[1][0]==b[1][1]==b[1][2]!=Tile.Empty or\
-           b[2][0]==b[2][1]==b[2][2]!=Tile.Empty or\
-           b[0][0]==b[1][0]==b[2][0]!=Tile.Empty or\
-           b[0][1]==b[1][1]==b[2][1]!=Tile.Empty or\
-           b[0][2]==b[1][2]==b[2][2]!=Tile.Empty or\
-           b[0][0]==b[1][1]==b[2][2]!=Tile.Empty or\
-           b[2][0]==b[1][1]==b[0][2]!=Tile.Empty
-
-def printBoard(b):
-    def formatTile(t):
-        return " " if t is Tile.Empty else "X" if t is Tile.Crosses else "O"
-    print("{}|{}|{}\n-+-+-\n{}|{}|{}\n-+-+-\n{}|{}|{}\n".format(*([formatTile(t) for t in b[0]]+[formatTile(t) for t in b[1]]+[formatTile(t) for t in b[2]])))
+def enumerateStates(startKey=0, geometry=STANDARD):
+    #Breadth first search over canonical keys, one ply at a time.
+    #Returns, for each ply from the start, the canonical keys of the states that are still
+    #in play or drawn, and the keys of the terminal states (wins and full boards).
+    powers = [3**cell for cell in range(geometry.cells)]
+    full = geometry.full
+    boardsByPly = [[geometry.getCanonicalKey(startKey)]]
+    terminalByPly = [[]]
+    noughts, crosses = geometry.getMasks(startKey)
+    digit = 1 if bin(noughts).count("1") == bin(crosses).count("1") else 2
+    frontier = boardsByPly[0]
+    while frontier:
+        boards = []
+        terminal = []
+        nextFrontier = []
+        seen = set()
+        for key in frontier:
+            noughts, crosses = geometry.getMasks(key)
+            empty = full & ~(noughts | crosses)
+            for cell in range(geometry.cells):
+                if empty >> cell & 1:
+                    child = geometry.getCanonicalKey(key + digit*powers[cell])
+                    if child not in seen:
+                        seen.add(child)
+                        noughts, crosses = geometry.getMasks(child)
+                        if geometry.isWinning(noughts) or geometry.isWinning(crosses):
+                            terminal.append(child)
+                        else:
+                            boards.append(child)
+                            if noughts | crosses == full:
+                                terminal.append(child)
+                            else:
+                                nextFrontier.append(child)
+        frontier = nextFrontier
+        digit = 3 - digit #Every state at a ply has the same player to move
+        if boards or terminal:
+            boardsByPly.append(boards)
+            terminalByPly.append(terminal)
+    return boardsByPly, terminalByPly
 
 def getAllBoardsFrom(startBoard):
-    def getNextBoards(b, turn):
-        for y in range(3):
-            for x in range(3):
-                if b[y][x] is Tile.Empty:
-                    newBoard = [[tile for tile in row] for row in b]
-                    newBoard[y][x] = turn
-                    for boardTransformation in getTransformations(newBoard):
-                        if boardTransformation in boards:
-                            break
-                    else:
-                        if not isWinningState(newBoard):
-                            boards.append(newBoard)
-                            getNextBoards(newBoard, Tile.Noughts if turn is Tile.Crosses else Tile.Crosses)
-
-    boards = [startBoard]
-    getNextBoards(startBoard, Tile.Noughts)
-    return boards
+    boardsByPly, terminalByPly = enumerateStates(getStateKey(startBoard))
+    return [getState(key) for boards in boardsByPly for key in boards]
 
 def splitEvenOddBoards(boards):
     evenBoards = []
@@ -79,7 +66,15 @@ def splitEvenOddBoards(boards):
     return (evenBoards, oddBoards)
 
 if __name__ == "__main__":
-    boards = getAllBoardsFrom([[Tile.Empty,Tile.Empty,Tile.Empty],[Tile.Empty,Tile.Empty,Tile.Empty],[Tile.Empty,Tile.Empty,Tile.Empty]])
+    logging.basicConfig(level=logging.INFO)
+
+    startTime = time.time()
+    boardsByPly, terminalByPly = enumerateStates()
+    logging.info("Enumerated states in {:.1f} ms.".format((time.time() - startTime)*1000))
+    for ply, (boards, terminal) in enumerate(zip(boardsByPly, terminalByPly)):
+        logging.info("Ply {}: {} states, {} terminal.".format(ply, len(boards), len(terminal)))
+
+    boards = [getState(key) for plyBoards in boardsByPly for key in plyBoards]
     evenBoards, oddBoards = splitEvenOddBoards(boards)
 
     with open("boards.pickle", "wb") as f:
@@ -0,0 +1,175 @@
+import logging
+import os
+import struct
+
+from boardGeometry import getGeometry
+from boardTables import TILES
+
+#An append-only log of played games: a header, then one fixed-size record per game holding
+#  moves: one byte per cell, the cell played at each ply (255 once the game is over)
+#  flags: the result as a Tile value in bits 0-1, and bit 2 set if the logged machine started
+#Each move is the cell on the canonical board of the position it was played in, so a game can be
+#replayed without knowing which orientation the boards were held in when it was played.
+MAGIC = b"NACGLOG\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHBB") #Magic, version, cells, size, win length
+NO_MOVE = 255
+STARTED = 4
+
+def getRecordSize(geometry):
+    return geometry.cells + 1
+
+def readHeader(file, path):
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("{} is too short to be a game log".format(path))
+    magic, version, cells, size, winLength = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or cells != size*size:
+        raise ValueError("{} is not a version {} game log".format(path, VERSION))
+    return getGeometry(size, winLength)
+
+def getCanonicalMove(geometry, before, after):
+    #The cell played on the canonical board of before, with after in before's orientation
+    canonicalKey, transform, uniqueMoves = before.getSymmetryInfo()
+    placed = after.getKey() - before.getKey()
+    digit = 1 if before.getMoveCount() % 2 == 0 else 2
+    for cell in range(geometry.cells):
+        if placed == digit*3**cell:
+            return geometry.transformCells[transform].index(cell)
+    raise ValueError("{} can't follow {} in one move".format(after, before))
+
+class GameLogWriter:
+    #Games are kept in memory and appended bufferGames at a time, and when the writer is closed
+    def __init__(self, path, geometry, bufferGames=4096):
+        self.path = path
+        self.geometry = geometry
+        self.bufferGames = bufferGames
+        self.buffer = bytearray()
+        self.bufferedGames = 0
+        self.gamesLogged = 0
+
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as file:
+                logGeometry = readHeader(file, path)
+            if logGeometry is not geometry:
+                raise ValueError("{} logs {} games, not {}".format(path, logGeometry, geometry))
+        else:
+            with open(path, "wb") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, geometry.cells, geometry.size, geometry.winLength))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def getCanonicalMove(self, before, after):
+        return getCanonicalMove(self.geometry, before, after)
+
+    def logGame(self, moves, result, machineStarted):
+        #moves: the canonical cell of every ply, from getCanonicalMove
+        self.buffer += bytes(moves) + bytes([NO_MOVE])*(self.geometry.cells - len(moves))
+        self.buffer.append(result.value | (STARTED if machineStarted else 0))
+        self.bufferedGames += 1
+        if self.bufferedGames >= self.bufferGames:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            with open(self.path, "ab") as file:
+                file.write(self.buffer)
+            self.gamesLogged += self.bufferedGames
+            self.buffer = bytearray()
+            self.bufferedGames = 0
+
+    def close(self):
+        self.flush()
+
+def readGames(path, chunkGames=65536):
+    #Yields (moves, result, machineStarted) for every game in the log, reading chunkGames at a time,
+    #so logs far bigger than memory can be streamed. The first value yielded is the log's geometry.
+    with open(path, "rb") as file:
+        geometry = readHeader(file, path)
+        yield geometry
+        recordSize = getRecordSize(geometry)
+        cells = geometry.cells
+        while True:
+            chunk = file.read(recordSize*chunkGames)
+            if len(chunk) % recordSize:
+                logging.warning("Ignoring an incomplete record at the end of {}.".format(path))
+            for offset in range(0, len(chunk) - recordSize + 1, recordSize):
+                record = chunk[offset:offset+recordSize]
+                moves = record[:cells]
+                end = moves.find(NO_MOVE)
+                yield (moves if end < 0 else moves[:end]), TILES[record[cells] & 3], bool(record[cells] & STARTED)
+            if len(chunk) < recordSize*chunkGames:
+                return
+
+def getPositions(geometry, moves): #The canonical key of the board each move was played on
+    key = 0
+    for ply, cell in enumerate(moves):
+        canonicalKey = geometry.getCanonicalKey(key)
+        yield canonicalKey
+        key = canonicalKey + (1 if ply % 2 == 0 else 2)*3**cell
+
+def replayGame(machine, moves, result, machineStarted, winDelta=3, drawDelta=1, loseDelta=-1):
+    #Trains machine on a logged game as if it had just played the logged machine's side
+    from machineLearningSimulation import Trajectory
+
+    trajectory = Trajectory(machineStarted)
+    lastPly = machine.cells - 1 #The forced last move has no beads
+    for ply, (canonicalKey, cell) in enumerate(zip(getPositions(machine.geometry, moves), moves)):
+        if (ply % 2 == 0) == machineStarted and ply < lastPly:
+            trajectory.moves.append((machine.getStateId(canonicalKey), cell))
+    machine.applyTrajectory(trajectory, result, winDelta, drawDelta, loseDelta)
+
+def replayLog(machine, path, winDelta=3, drawDelta=1, loseDelta=-1):
+    #Returns the number of games replayed
+    games = readGames(path)
+    geometry = next(games)
+    if geometry is not machine.geometry:
+        raise ValueError("{} logs {} games, but the machine plays {}".format(path, geometry, machine.geometry))
+    count = 0
+    for moves, result, machineStarted in games:
+        replayGame(machine, moves, result, machineStarted, winDelta, drawDelta, loseDelta)
+        count += 1
+    return count
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    from machineLearningSimulation import GameManager, Machine, loadMachine, saveMachine
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Record games against a random player, or train a machine from recorded games.")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("log", help="game log file, appended to by record")
+    parser.add_argument("--machine", default="trainedMachine.pickle", help="machine that plays (record) or is trained (replay)")
+    parser.add_argument("--games", type=int, default=100000, help="games to record")
+    parser.add_argument("--blank", action="store_true", help="replay into a blank machine instead of --machine")
+    parser.add_argument("--output", help="where replay saves the machine (default: --machine)")
+    parser.add_argument("--win-delta", type=int, default=1)
+    parser.add_argument("--draw-delta", type=int, default=0)
+    parser.add_argument("--lose-delta", type=int, default=-10)
+    parser.add_argument("--seed", type=int, help="seed for the recorded games")
+    args = parser.parse_args()
+
+    startTime = time.time()
+    if args.mode == "record":
+        machine = loadMachine(args.machine)
+        rng = random.Random(args.seed)
+        with GameLogWriter(args.log, machine.geometry) as gameLog:
+            GameManager.gameLog = gameLog
+            for game in range(args.games):
+                GameManager.playAgainstRandom(machine, game % 2 == 0, True, args.win_delta, args.draw_delta, args.lose_delta, rng)
+        GameManager.gameLog = None
+        saveMachine(machine, args.machine)
+        logging.info("Recorded {} games in {:.1f} seconds.".format(args.games, time.time() - startTime))
+    else:
+        machine = Machine(next(readGames(args.log))) if args.blank else loadMachine(args.machine)
+        games = replayLog(machine, args.log, args.win_delta, args.draw_delta, args.lose_delta)
+        saveMachine(machine, args.output or args.machine)
+        logging.info("Replayed {} games in {:.1f} seconds.".format(games, time.time() - startTime))
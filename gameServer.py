@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+
+from boardGeometry import getGeometry
+from boardTables import Tile
+
+#A line based protocol for playing a Machine over TCP or a Unix socket. The server greets with
+#"HELLO <size> <win length>", then answers every command with exactly one line:
+#  NEW <1 if the machine starts, else 0>  ->  OK, or MOVE x y when the machine starts
+#  MOVE x y                               ->  MOVE x y, MOVE x y END <result>, END <result> or ERROR <reason>
+#  QUIT                                   ->  BYE, then the connection is closed
+#where <result> is noughts, crosses or draw. Noughts always go first.
+RESULTS = {Tile.Noughts: "noughts", Tile.Crosses: "crosses", Tile.Empty: "draw"}
+
+class Session: #One connection, playing one game at a time
+    def __init__(self):
+        self.board = None
+        self.trajectory = None
+
+class GameServer:
+    #Sessions queue the boards the machine has to move on. Every tick the batcher answers all of
+    #them with one Machine.chooseMoves call. With training, finished games are handed to a single
+    #writer task, the only code that changes the beads, which saves the machine to savePath every
+    #saveSeconds. Updates still queued when the server stops are applied and the machine saved.
+    def __init__(self, machine, training=False, greedy=False, tickSeconds=0.001, winDelta=3, drawDelta=1, loseDelta=-1,
+                 savePath=None, saveSeconds=None):
+        from machineLearningSimulation import GameManager, Trajectory
+
+        self.machine = machine
+        self.training = training
+        self.greedy = greedy
+        self.tickSeconds = tickSeconds
+        self.deltas = (winDelta, drawDelta, loseDelta)
+        self.savePath = savePath
+        self.saveSeconds = saveSeconds
+        self.lastSaveTime = time.time()
+        self.newBoard = GameManager.newBoard
+        self.newTrajectory = Trajectory
+
+        self.pending = []
+        self.movesPending = None
+        self.updates = None
+        self.tasks = []
+        self.batches = 0
+        self.batchedMoves = 0
+        self.gamesPlayed = 0
+
+    async def start(self, host="127.0.0.1", port=8765, unixPath=None):
+        self.movesPending = asyncio.Event()
+        self.tasks.append(asyncio.create_task(self.batchMoves()))
+        if self.training:
+            self.updates = asyncio.Queue()
+            self.tasks.append(asyncio.create_task(self.trainMachine()))
+        if unixPath is not None:
+            return await asyncio.start_unix_server(self.handleClient, unixPath)
+        return await asyncio.start_server(self.handleClient, host, port)
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.updates is not None:
+            while not self.updates.empty():
+                self.machine.applyTrajectory(*self.updates.get_nowait(), *self.deltas)
+            self.save()
+        logging.info("Played {} games, {} machine moves in {} batches ({:.1f} per batch).".format(
+            self.gamesPlayed, self.batchedMoves, self.batches, self.batchedMoves/max(self.batches, 1)))
+
+    async def getMachineMove(self, board, trajectory):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((board.getKey(), trajectory, future))
+        self.movesPending.set()
+        return await future
+
+    async def batchMoves(self):
+        while True:
+            await self.movesPending.wait()
+            if self.tickSeconds:
+                await asyncio.sleep(self.tickSeconds) #Let more sessions join the batch
+            self.movesPending.clear()
+            pending, self.pending = self.pending, []
+            try:
+                moves = self.machine.chooseMoves([key for key, trajectory, future in pending], self.greedy,
+                                                 [trajectory for key, trajectory, future in pending])
+            except Exception as exception:
+                for key, trajectory, future in pending:
+                    if not future.done():
+                        future.set_exception(exception)
+                continue
+            for (key, trajectory, future), move in zip(pending, moves):
+                if not future.done():
+                    future.set_result(move)
+            self.batches += 1
+            self.batchedMoves += len(pending)
+
+    async def trainMachine(self):
+        while True:
+            trajectory, result = await self.updates.get()
+            self.machine.applyTrajectory(trajectory, result, *self.deltas)
+            if self.saveSeconds is not None and time.time() - self.lastSaveTime >= self.saveSeconds:
+                self.save()
+
+    def save(self):
+        #Written to a temporary file first, so a crash while saving leaves the last save intact
+        from machineLearningSimulation import saveMachine
+
+        if self.savePath is not None:
+            saveMachine(self.machine, self.savePath + ".tmp")
+            os.replace(self.savePath + ".tmp", self.savePath)
+            self.lastSaveTime = time.time()
+            logging.info("Saved machine to {}.".format(self.savePath))
+
+    def endGame(self, session, result):
+        if self.training:
+            self.updates.put_nowait((session.trajectory, result))
+        session.board = session.trajectory = None
+        self.gamesPlayed += 1
+        return "END " + RESULTS[result]
+
+    async def playMachineMove(self, session):
+        x, y = await self.getMachineMove(session.board, session.trajectory)
+        session.board = session.board.makeMove((x, y))
+        reply = "MOVE {} {}".format(x, y)
+        result = session.board.isGameOver()
+        if result is not False:
+            reply += " " + self.endGame(session, result)
+        return reply
+
+    async def handleCommand(self, session, command):
+        if command[0] == "NEW" and len(command) == 2 and command[1] in ("0", "1"):
+            machineStarts = command[1] == "1"
+            session.board = self.newBoard(self.machine.geometry)
+            session.trajectory = self.newTrajectory(machineStarts) if self.training else None
+            return await self.playMachineMove(session) if machineStarts else "OK"
+
+        if command[0] == "MOVE" and len(command) == 3:
+            if session.board is None:
+                return "ERROR no game, send NEW first"
+            try:
+                x, y = int(command[1]), int(command[2])
+            except ValueError:
+                return "ERROR x and y must be integers"
+            if not session.board.isValidMove(x, y):
+                return "ERROR {} {} is not an empty cell".format(x, y)
+            session.board = session.board.makeMove((x, y))
+            result = session.board.isGameOver()
+            if result is not False:
+                return self.endGame(session, result)
+            return await self.playMachineMove(session)
+
+        return "ERROR unknown command"
+
+    async def handleClient(self, reader, writer):
+        session = Session()
+        geometry = self.machine.geometry
+        writer.write("HELLO {} {}\n".format(geometry.size, geometry.winLength).encode())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("ascii", "replace").split()
+                if not command:
+                    continue
+                if command[0] == "QUIT":
+                    writer.write(b"BYE\n")
+                    break
+                writer.write((await self.handleCommand(session, command) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def runClient(games, latencies, host, port, unixPath, rng):
+    #Plays games random moves against the server, recording the seconds each reply took
+    if unixPath is not None:
+        reader, writer = await asyncio.open_unix_connection(unixPath)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    hello, size, winLength = (await reader.readline()).decode().split()
+    geometry = getGeometry(int(size), int(winLength))
+
+    async def send(command):
+        startTime = time.perf_counter()
+        writer.write((command + "\n").encode())
+        reply = (await reader.readline()).decode().split()
+        latencies.append(time.perf_counter() - startTime)
+        if not reply or reply[0] == "ERROR":
+            raise RuntimeError("Server replied {!r} to {!r}".format(" ".join(reply), command))
+        return reply
+
+    for game in range(games):
+        board = geometry.newBoard()
+        reply = await send("NEW {}".format(game % 2))
+        while "END" not in reply:
+            if reply[0] == "MOVE":
+                board = board.makeMove((int(reply[1]), int(reply[2])))
+            x, y = rng.choice([(x, y) for y in range(geometry.size) for x in range(geometry.size) if board.isValidMove(x, y)])
+            board = board.makeMove((x, y))
+            reply = await send("MOVE {} {}".format(x, y))
+
+    writer.write(b"QUIT\n")
+    await reader.readline()
+    writer.close()
+
+def getPercentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction*len(values)))]
+
+async def runLoad(sessions, games, host="127.0.0.1", port=8765, unixPath=None, seed=0):
+    #Runs sessions concurrent clients of games games each and returns the statistics
+    latencies = []
+    startTime = time.perf_counter()
+    await asyncio.gather(*(runClient(games, latencies, host, port, unixPath, random.Random(seed + session)) for session in range(sessions)))
+    seconds = time.perf_counter() - startTime
+    return {"sessions": sessions, "games": sessions*games, "seconds": seconds,
+            "sessionsPerSecond": sessions/seconds, "gamesPerSecond": sessions*games/seconds,
+            "p50Milliseconds": getPercentile(latencies, 0.5)*1000, "p99Milliseconds": getPercentile(latencies, 0.99)*1000}
+
+async def serve(server, host, port, unixPath):
+    listener = await server.start(host, port, unixPath)
+    logging.info("Serving on {}.".format(unixPath or "{}:{}".format(host, port)))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.stop()
+
+async def loadLocally(server, sessions, games, unixPath):
+    #Server and clients share this process and its event loop
+    host, port = "127.0.0.1", 0
+    listener = await server.start(host, port, unixPath)
+    if unixPath is None:
+        port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        statistics = await runLoad(sessions, games, host, port, unixPath)
+    server.stop()
+    return statistics
+
+def logStatistics(statistics):
+    logging.info("{} sessions played {} games in {:.2f} seconds: {:.1f} sessions/sec, {:.0f} games/sec.".format(
+        statistics["sessions"], statistics["games"], statistics["seconds"], statistics["sessionsPerSecond"], statistics["gamesPerSecond"]))
+    logging.info("Reply latency p50 {:.2f} ms, p99 {:.2f} ms.".format(statistics["p50Milliseconds"], statistics["p99Milliseconds"]))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Serve games against a machine, or generate load against a server.")
+    parser.add_argument("mode", choices=("serve", "load"), help="load without --host/--port/--unix runs its own server in process")
+    parser.add_argument("--machine", default="trainedMachine.pickle")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--unix", help="Unix socket path instead of TCP")
+    parser.add_argument("--training", action="store_true", help="train the machine from the games it serves, saving it to --machine")
+    parser.add_argument("--save-seconds", type=float, default=60, help="seconds between saves of a training machine")
+    parser.add_argument("--greedy", action="store_true", help="play the move with the most beads instead of drawing one")
+    parser.add_argument("--tick", type=float, default=0.001, help="seconds to wait for more moves to batch")
+    parser.add_argument("--sessions", type=int, default=100, help="concurrent clients for load")
+    parser.add_argument("--games", type=int, default=10, help="games per client for load")
+    args = parser.parse_args()
+
+    def getServer():
+        from machineLearningSimulation import loadMachine
+
+        return GameServer(loadMachine(args.machine), args.training, args.greedy, args.tick, savePath=args.machine, saveSeconds=args.save_seconds)
+
+    if args.mode == "serve":
+        try:
+            asyncio.run(serve(getServer(), args.host, args.port or 8765, args.unix))
+        except KeyboardInterrupt:
+            pass
+    elif args.port is None and args.unix is None:
+        logStatistics(asyncio.run(loadLocally(getServer(), args.sessions, args.games, None)))
+    else:
+        logStatistics(asyncio.run(runLoad(args.sessions, args.games, args.host, args.port or 8765, args.unix)))
@@ -0,0 +1,213 @@
+import copy
+import logging
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from boardGeometry import STANDARD
+from boardTables import Tile
+from parallelTraining import applyBeadDeltas, getBeadDeltas, getBeads, ignoreInterrupts, mergeBeadDeltas
+
+#Trains a machine against a mix of opponents: a random player, frozen snapshots of the machine
+#itself and a perfect minimax player (3x3 only). Each opponent has its own bead changes, given as
+#(win, draw, lose) for the machine being trained.
+OPPONENTS = ("random", "snapshot", "minimax")
+DEFAULT_DELTAS = {"random": (1, 0, -10), "snapshot": (3, 1, -1), "minimax": (0, 2, -1)}
+
+def pickMaskCell(mask, rng): #A random set bit of mask
+    cells = [cell for cell in range(mask.bit_length()) if mask >> cell & 1]
+    return cells[int(rng.random()*len(cells))]
+
+def playLeagueBatch(machine, opponents, snapshots, deltas, rng, training=True):
+    #Plays one game per entry of opponents, all advanced a ply at a time, with the machine starting
+    #every other game. Returns the result of each game for the machine: "win", "draw" or "loss".
+    from machineLearningSimulation import GameManager, Trajectory
+
+    if "minimax" in opponents:
+        from minimax import getOptimalMoveMask
+
+    geometry, size = machine.geometry, machine.geometry.size
+    boards = [GameManager.newBoard(geometry) for opponent in opponents]
+    trajectories = [Trajectory(game % 2 == 0) for game in range(len(opponents))]
+    players = [rng.choice(snapshots) if opponent == "snapshot" else opponent for opponent in opponents]
+    outcomes = [None]*len(opponents)
+
+    active = list(range(len(opponents)))
+    while active:
+        #Group the games by who is to move, so every machine moves in one batch
+        movers = {}
+        for game in active:
+            machineTurn = (boards[game].getMoveCount() % 2 == 0) == trajectories[game].started
+            movers.setdefault(machine if machineTurn else players[game], []).append(game)
+
+        moves = {}
+        for mover, games in movers.items():
+            if mover is machine:
+                chosen = machine.chooseMoves([boards[game].getKey() for game in games], False, [trajectories[game] for game in games], rng)
+            elif mover == "random":
+                chosen = [pickMaskCell(boards[game].getUniqueMoveMask(), rng) for game in games]
+                chosen = [(cell % size, cell // size) for cell in chosen]
+            elif mover == "minimax":
+                chosen = [pickMaskCell(getOptimalMoveMask(boards[game].getKey()), rng) for game in games]
+                chosen = [(cell % size, cell // size) for cell in chosen]
+            else: #A snapshot
+                chosen = mover.chooseMoves([boards[game].getKey() for game in games], rng=rng)
+            moves.update(zip(games, chosen))
+
+        stillActive = []
+        for game in active:
+            boards[game] = boards[game].makeMove(moves[game])
+            result = boards[game].isGameOver()
+            if result is False:
+                stillActive.append(game)
+                continue
+            won = Tile.Noughts if trajectories[game].started else Tile.Crosses
+            outcomes[game] = "draw" if result is Tile.Empty else "win" if result is won else "loss"
+            if training:
+                machine.applyTrajectory(trajectories[game], result, *deltas[opponents[game]])
+        active = stillActive
+
+    return outcomes
+
+def leagueWorker(machine, snapshots, opponents, seed, deltas, batchSize):
+    #Plays the opponents' games on this worker's copy of the machine in batches
+    rng = random.Random(seed)
+    before = getBeads(machine)
+    startTime = time.time()
+    results = {opponent: Counter() for opponent in OPPONENTS}
+    for first in range(0, len(opponents), batchSize):
+        batch = opponents[first:first+batchSize]
+        for opponent, outcome in zip(batch, playLeagueBatch(machine, batch, snapshots, deltas, rng)):
+            results[opponent][outcome] += 1
+    return getBeadDeltas(before, machine), results, time.time() - startTime
+
+class League:
+    def __init__(self, machine, ratios, deltas=None, batchSize=256, snapshotGames=20000, maxSnapshots=5, workers=1, merge="sum"):
+        #ratios: opponent name to its share of the games; snapshot games are played against random
+        #until the first snapshot is taken, after snapshotGames games
+        unknown = set(ratios) - set(OPPONENTS)
+        if unknown:
+            raise ValueError("Unknown opponents: {}".format(", ".join(sorted(unknown))))
+        if ratios.get("minimax") and machine.geometry is not STANDARD:
+            raise ValueError("The minimax player only supports the 3x3 board, not {}".format(machine.geometry))
+
+        self.machine = machine
+        self.ratios = ratios
+        self.deltas = dict(DEFAULT_DELTAS, **(deltas or {}))
+        self.batchSize = batchSize
+        self.snapshotGames = snapshotGames
+        self.maxSnapshots = maxSnapshots
+        self.workers = workers
+        self.merge = merge
+
+        self.snapshots = []
+        self.gamesPlayed = 0
+        self.gamesSinceSnapshot = 0
+        self.results = {opponent: Counter() for opponent in OPPONENTS}
+
+    def takeSnapshot(self):
+        self.snapshots = (self.snapshots + [copy.deepcopy(self.machine)])[-self.maxSnapshots:]
+        self.gamesSinceSnapshot = 0
+
+    def pickOpponents(self, games, rng):
+        names = [name for name in OPPONENTS if self.ratios.get(name)]
+        opponents = rng.choices(names, [self.ratios[name] for name in names], k=games)
+        if not self.snapshots:
+            opponents = ["random" if opponent == "snapshot" else opponent for opponent in opponents]
+        return opponents
+
+    def playRound(self, games, rng, pool=None):
+        #Plays games games, split over the pool's workers, and merges what they learnt
+        opponents = self.pickOpponents(games, rng)
+        if pool is None: #The games train self.machine directly
+            workerResults = [leagueWorker(self.machine, self.snapshots, opponents, rng.getrandbits(64), self.deltas, self.batchSize)]
+        else:
+            share = -(-games // self.workers)
+            jobs = [(self.machine, self.snapshots, opponents[first:first+share], rng.getrandbits(64), self.deltas, self.batchSize)
+                    for first in range(0, games, share)]
+            workerResults = pool.starmap(leagueWorker, jobs)
+            applyBeadDeltas(self.machine, mergeBeadDeltas([beadDeltas for beadDeltas, results, seconds in workerResults], self.merge))
+
+        for beadDeltas, results, seconds in workerResults:
+            for opponent, outcomes in results.items():
+                self.results[opponent].update(outcomes)
+        self.gamesPlayed += games
+        self.gamesSinceSnapshot += games
+        if self.gamesSinceSnapshot >= self.snapshotGames:
+            self.takeSnapshot()
+        return workerResults
+
+    def train(self, games, roundGames=20000, seed=None):
+        #Runs until games have been played in total or Ctrl-C, and returns the number of games played
+        rng = random.Random(seed)
+        pool = Pool(self.workers, initializer=ignoreInterrupts) if self.workers > 1 else None
+        try:
+            while self.gamesPlayed < games:
+                startTime = time.time()
+                roundGames = min(roundGames, games - self.gamesPlayed)
+                self.playRound(roundGames, rng, pool)
+                logging.info("{} games ({:.0f} games/sec), {} snapshots. {}".format(
+                    self.gamesPlayed, roundGames/(time.time() - startTime), len(self.snapshots), self.formatResults()))
+        except KeyboardInterrupt:
+            if pool is not None:
+                pool.terminate()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return self.gamesPlayed
+
+    def formatResults(self):
+        parts = []
+        for opponent in OPPONENTS:
+            games = sum(self.results[opponent].values())
+            if games:
+                parts.append("Against {}: {}.".format(opponent, ", ".join("{} {:.1%}".format(outcome, self.results[opponent][outcome]/games) for outcome in ("win", "draw", "loss"))))
+        return " ".join(parts)
+
+if __name__ == "__main__":
+    import argparse
+
+    from machineLearningSimulation import Machine, loadMachine, saveMachine
+
+    logging.basicConfig(level=logging.INFO)
+
+    def parseDeltas(text):
+        opponent, values = text.split("=")
+        return opponent, tuple(int(value) for value in values.split(","))
+
+    parser = argparse.ArgumentParser(description="Train a machine against a mix of random, past and perfect opponents.")
+    parser.add_argument("games", type=int)
+    parser.add_argument("--machine", default="trainedMachine.pickle")
+    parser.add_argument("--random", type=float, default=0.6, help="share of games against a random player")
+    parser.add_argument("--snapshot", type=float, default=0.3, help="share of games against frozen snapshots of the machine")
+    parser.add_argument("--minimax", type=float, default=0.1, help="share of games against a perfect player (3x3 only)")
+    parser.add_argument("--deltas", type=parseDeltas, action="append", default=[], help="bead changes for an opponent, e.g. minimax=0,2,-1")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--round-games", type=int, default=20000, help="games between merges and log lines")
+    parser.add_argument("--snapshot-games", type=int, default=20000, help="games between snapshots")
+    parser.add_argument("--max-snapshots", type=int, default=5)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    try:
+        machine = loadMachine(args.machine)
+        logging.info("Loaded machine from pickle file.")
+    except FileNotFoundError:
+        logging.info("Could not find pickle file, so creating a blank machine.")
+        machine = Machine()
+
+    league = League(machine, {"random": args.random, "snapshot": args.snapshot, "minimax": args.minimax}, dict(args.deltas),
+                    args.batch_size, args.snapshot_games, args.max_snapshots, args.workers)
+    league.train(args.games, args.round_games, args.seed)
+
+    if machine.geometry is STANDARD:
+        from minimax import evaluateMachine
+
+        evaluation = evaluateMachine(machine)
+        logging.info("{:.1f}% of the beads are on optimal moves, {} blunder states.".format(evaluation["optimalMass"], evaluation["blunderStates"]))
+
+    saveMachine(machine, args.machine)
+    logging.info("Saved machine to pickle file.")
@@ -0,0 +1,102 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from boardGeometry import getGeometry
+from machineLearningSimulation import Machine, getKeyTypecode, loadMachine, saveMachine
+
+#A machine file is a header followed by little-endian sections:
+#  state keys (stateCount), beads (stateCount*cells), cumulative beads (stateCount*cells), bead totals (stateCount)
+#Keys are int32 or int64 (keyBytes), everything else is int32. The derived sections let a
+#memory-mapped machine pick beads straight away.
+#Version 1 files are 3x3 machines with int32 keys and zeros where version 2 describes the board.
+MAGIC = b"NACMACH\0"
+VERSION = 2
+HEADER = struct.Struct("<8sHHIBBBB") #Magic, version, cells per state, state count, size, win length, key bytes, lazy
+KEY_TYPECODES = {4: "i", 8: "q"}
+
+def getSections(stateCount, cells, keyBytes):
+    return (("stateKeys", stateCount, KEY_TYPECODES[keyBytes]), ("beads", stateCount*cells, "i"),
+            ("cumulativeBeads", stateCount*cells, "i"), ("beadTotals", stateCount, "i"))
+
+def saveMachineFile(machine, path):
+    stateCount = len(machine.stateKeys)
+    keyBytes = array(getKeyTypecode(machine.geometry)).itemsize
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, machine.cells, stateCount, machine.geometry.size, machine.geometry.winLength, keyBytes, machine.lazy))
+        for name, length, typecode in getSections(stateCount, machine.cells, keyBytes):
+            values = array(typecode, getattr(machine, name))
+            if sys.byteorder == "big":
+                values.byteswap()
+            file.write(values.tobytes())
+
+def readHeader(buffer, path):
+    #Returns the sections and the Machine.fromArrays arguments that describe the board
+    if len(buffer) < HEADER.size:
+        raise ValueError("{} is too short to be a machine file".format(path))
+    magic, version, cells, stateCount, size, winLength, keyBytes, lazy = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("{} is not a machine file".format(path))
+    if version == 1:
+        size, winLength, keyBytes = 3, 3, 4
+    if version not in (1, VERSION) or cells != size*size or keyBytes not in KEY_TYPECODES:
+        raise ValueError("{} has unsupported version {} with {} cells per state".format(path, version, cells))
+    sections = getSections(stateCount, cells, keyBytes)
+    if len(buffer) != HEADER.size + sum(length*array(typecode).itemsize for name, length, typecode in sections):
+        raise ValueError("{} has the wrong size for {} states".format(path, stateCount))
+    return sections, {"geometry": getGeometry(size, winLength), "lazy": bool(lazy)}
+
+def loadMachineFile(path, memoryMap=False):
+    #With memoryMap the machine shares the file's pages read-only with every other process
+    #that maps it; it can make moves but not train. Lazy machines (every machine bigger than 3x3)
+    #add states as they meet them, so they can't be mapped.
+    with open(path, "rb") as file:
+        if not memoryMap:
+            data = file.read()
+            sections, arguments = readHeader(data, path)
+            offset = HEADER.size
+            for name, length, typecode in sections:
+                values = array(typecode)
+                values.frombytes(data[offset:offset+length*values.itemsize])
+                if sys.byteorder == "big":
+                    values.byteswap()
+                arguments[name] = values
+                offset += length*values.itemsize
+            return Machine.fromArrays(**arguments)
+
+        if sys.byteorder == "big":
+            raise ValueError("Memory-mapped machine files need a little-endian machine")
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    sections, arguments = readHeader(mapping, path)
+    if arguments["lazy"]:
+        mapping.close()
+        raise ValueError("{} holds a lazy {} machine, which adds states as it plays, so it can't be memory-mapped; load it with memoryMap=False".format(path, arguments["geometry"]))
+    view = memoryview(mapping)
+    offset = HEADER.size
+    for name, length, typecode in sections:
+        itemsize = array(typecode).itemsize
+        arguments[name] = view[offset:offset+length*itemsize].cast(typecode)
+        offset += length*itemsize
+    machine = Machine.fromArrays(**arguments)
+    machine.mapping = mapping
+    return machine
+
+def convertMachine(sourcePath, destinationPath):
+    #Either path may be a pickle (.pickle) or a machine file (anything else)
+    machine = loadMachine(sourcePath) if sourcePath.endswith(".pickle") else loadMachineFile(sourcePath)
+    if destinationPath.endswith(".pickle"):
+        saveMachine(machine, destinationPath)
+    else:
+        saveMachineFile(machine, destinationPath)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a machine between pickle and machine file formats.")
+    parser.add_argument("source", nargs="?", default="trainedMachine.pickle")
+    parser.add_argument("destination", nargs="?", default="trainedMachine.machine")
+    args = parser.parse_args()
+
+    convertMachine(args.source, args.destination)
@@ -1,70 +1,121 @@
+import os
 import time
 import random
-from enum import Enum
 import pickle
 import logging
-
-logging.basicConfig(level=logging.DEBUG)
-
-class Tile(Enum):
-    Empty = 0
-    Noughts = 1
-    Crosses = 2
-
-try:
-    with open("boards.pickle", "rb") as file:
-        ALL_BOARDS = pickle.load(file)
-        logging.info("Loaded boards from boards.pickle.")
-except FileNotFoundError:
-    logging.error("Could not find boards.pickle file.")
-    raise
-
-class Matchbox:
-    def __init__(self, state):
-        self.board = Board(state)
-        self.box = Box()
-
-        self.fill()
+from array import array
+from bisect import bisect_right
+
+from bitBoard import BitBoard
+from boardGeometry import STANDARD, GridBoard, getGeometry
+from boardTables import Tile, formatBoard, getStateKey, getState, getMoveGrid, getCanonicalKey, getCanonicalTransform, transformCells
+
+class Unpickler(pickle.Unpickler):
+    #Pickles written by running this file as a script refer to __main__ for Tile, Machine etc.
+    #so map both names onto whichever module is running
+    def find_class(self, module, name):
+        if module in ("__main__", "machineLearningSimulation"):
+            module = __name__
+        return super().find_class(module, name)
+
+BOARDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "boards.pickle")
+BOARDS = None
+
+def getAllBoards(): #Every 3x3 state in play, loaded on first use
+    global BOARDS
+    if BOARDS is None:
+        try:
+            with open(BOARDS_PATH, "rb") as file:
+                BOARDS = Unpickler(file).load()
+            logging.debug("Loaded boards from {}.".format(BOARDS_PATH))
+        except FileNotFoundError:
+            from createBoardsPickle import enumerateStates
+
+            logging.warning("Could not find {}, so enumerating the boards instead.".format(BOARDS_PATH))
+            BOARDS = [getState(key) for boards in enumerateStates()[0] for key in boards]
+    return BOARDS
+
+def __getattr__(name): #ALL_BOARDS is still there for older code, but only loaded when asked for
+    if name == "ALL_BOARDS":
+        return getAllBoards()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+STATE_INDEX = None
+
+def getKeyTypecode(geometry): #Array typecode big enough for the keys of the geometry
+    return "i" if 3**geometry.cells < 2**31 else "q"
+
+def getStateIndex(): #Canonical key of each state id and the reverse lookup, shared by every Machine
+    global STATE_INDEX
+    if STATE_INDEX is None:
+        stateKeys = array("i", dict.fromkeys(getCanonicalKey(getStateKey(state)) for state in getAllBoards()))
+        STATE_INDEX = (stateKeys, {key: stateId for stateId, key in enumerate(stateKeys)})
+    return STATE_INDEX
+
+class Matchbox: #A view of one state's beads inside a Machine
+    def __init__(self, machine, stateId):
+        self.machine = machine
+        self.stateId = stateId
+        self.box = Box(machine, stateId)
+
+    @property
+    def board(self):
+        return self.machine.getBoard(self.machine.stateKeys[self.stateId])
 
     def fill(self):
         self.box.fill(self.board)
 
-    def pickBead(self):
-        return self.box.pickBead()
+    def pickBead(self, rng=random):
+        return self.box.pickBead(rng)
 
     def addBeads(self, bead, number):
         self.box.addBeads(bead, number)
 
     def isEmpty(self):
-        return self.box.getBeadCount() == 0
+        return self.machine.beadTotals[self.stateId] == 0
 
-class Box:
-    def __init__(self):
-        self.beads = [0 for y in range(3) for x in range(3)]
+class Box: #One bead count per cell, row by row, for one state id of a Machine
+    def __init__(self, machine, stateId):
+        self.machine = machine
+        self.stateId = stateId
+        self.offset = stateId*machine.cells
+
+    @property
+    def beads(self):
+        size = self.machine.geometry.size
+        beads = self.machine.beads[self.offset:self.offset+self.machine.cells]
+        return [beads[y*size:(y+1)*size].tolist() for y in range(size)]
 
     def fill(self, board):
-        eligible = board.getUniqueMoves()
+        eligible = board.getUniqueMoveMask()
 
-        beadCount = int(2**(3-board.getMoveCount()//2))
+        beadCount = self.machine.geometry.getInitialBeads(board.getMoveCount())
 
-        self.beads = [[beadCount if eligible[y][x] else 0 for x in range(3)] for y in range(3)]
+        beads = self.machine.beads
+        for cell in range(self.machine.cells):
+            beads[self.offset+cell] = beadCount if eligible >> cell & 1 else 0
+        self.machine.updateCumulativeBeads(self.stateId)
+        self.machine.changedStates.add(self.stateId)
 
     def getBeadCount(self):
-        return sum(map(sum,self.beads))
+        return self.machine.beadTotals[self.stateId]
 
-    def pickBead(self): #Returns a pos: (x, y)
-        beadNum = random.randint(1, self.getBeadCount())
-        for y in range(3):
-            for x in range(3):
-                beadNum -= self.beads[y][x]
-                if beadNum <= 0:
-                    return (x, y)
+    def pickBead(self, rng=random): #Returns a pos: (x, y)
+        size = self.machine.geometry.size
+        cell = bisect_right(self.machine.cumulativeBeads, int(rng.random()*self.machine.beadTotals[self.stateId]), self.offset, self.offset+self.machine.cells) - self.offset
+        return (cell % size, cell // size)
 
     def addBeads(self, bead, number):
-        if self.beads[bead[1]][bead[0]] + number < 0:
-            self.beads[bead[1]][bead[0]] = 0
-        else:
-            self.beads[bead[1]][bead[0]] += number
+        cell = bead[1]*self.machine.geometry.size + bead[0]
+        beads = self.machine.beads
+        change = max(number, -beads[self.offset+cell])
+        if change:
+            beads[self.offset+cell] += change
+            self.machine.beadTotals[self.stateId] += change
+            cumulativeBeads = self.machine.cumulativeBeads
+            for index in range(self.offset+cell, self.offset+self.machine.cells):
+                cumulativeBeads[index] += change
+            self.machine.changedStates.add(self.stateId)
 
 class Board:
     def __init__(self, state):
@@ -80,6 +131,11 @@ class Board:
                     crossesCount += 1
 
         self.nextTurn = Tile.Noughts if noughtsCount == crossesCount else Tile.Crosses
+        self.symmetry = None
+
+    @classmethod
+    def empty(cls):
+        return cls(getState(0))
 
     def __eq__(self, other):
         return self.state == other.state
@@ -87,10 +143,11 @@ class Board:
     def __getitem__(self, key):
         return self.state[key]
 
+    def getKey(self):
+        return getStateKey(self.state)
+
     def __str__(self):
-        def formatTile(t):
-            return " " if t is Tile.Empty else "X" if t is Tile.Crosses else "O"
-        return "{}|{}|{}\n-+-+-\n{}|{}|{}\n-+-+-\n{}|{}|{}".format(*([formatTile(t) for t in self.state[0]]+[formatTile(t) for t in self.state[1]]+[formatTile(t) for t in self.state[2]]))
+        return formatBoard(self.state)
 
     def makeMove(self, bead):
         newState = [[self.state[y][x] for x in range(3)] for y in range(3)]
@@ -100,27 +157,16 @@ class Board:
     def getMoveCount(self):
         return sum(True if self.state[y][x] is not Tile.Empty else False for y in range(3) for x in range(3))
 
-    def getUniqueMoves(self):
-        def eliminate(*positions):
-            for x,y in positions:
-                moves[y][x] = False
-        
-        moves = [[True if self.state[y][x] is Tile.Empty else False for x in range(3)] for y in range(3)]
-
-        if self == self.rotate90():
-            eliminate((1,0),(2,0),(2,1),(0,2),(1,2),(2,2))
-        if self == self.rotate180():
-            eliminate((1,0),(2,0),(2,1),(2,2))
-        if self == self.flipH():
-            eliminate((0,2),(1,2),(2,2))
-        if self == self.flipV():
-            eliminate((2,0),(2,1),(2,2))
-        if self == self.flipH().rotate90():
-            eliminate((1,0),(2,0),(2,1))
-        if self == self.rotate90().flipH():
-            eliminate((2,1),(1,2),(2,2))
+    def getSymmetryInfo(self): #(canonical key, transform to it, unique move mask), looked up once per board
+        if self.symmetry is None:
+            self.symmetry = STANDARD.getSymmetryInfo(self.getKey())
+        return self.symmetry
 
-        return moves
+    def getUniqueMoveMask(self):
+        return self.getSymmetryInfo()[2]
+
+    def getUniqueMoves(self):
+        return getMoveGrid(self.getUniqueMoveMask())
 
     def isValidMove(self, x, y):
         return 0 <= x <= 2 and 0 <= y <= 2 and self.state[y][x] is Tile.Empty
@@ -145,97 +191,262 @@ class Board:
 
         return False
 
-    def flipH(self):
-        return Board(self.state[::-1])
-
-    def flipV(self):
-        return Board(list(map(lambda x:x[::-1], self.state)))
-
-    def rotate90(self):
-        return Board([[self.state[2][0],self.state[1][0],self.state[0][0]],
-                      [self.state[2][1],self.state[1][1],self.state[0][1]],
-                      [self.state[2][2],self.state[1][2],self.state[0][2]]])
+    def standardise(self):
+        canonicalKey = self.getSymmetryInfo()[0]
+        board = Board(getState(canonicalKey))
+        board.symmetry = (canonicalKey, 0, STANDARD.getUniqueMoveMask(canonicalKey))
+        return board
 
-    def rotate180(self):
-        return self.rotate90().rotate90()
+class Trajectory: #The moves a Machine made in one game, kept by whoever is playing it rather than by the Machine
+    def __init__(self, started=True):
+        self.started = started
+        self.moves = [] #(state id, cell) pairs, with the cell on the canonical board
 
-    def rotate270(self):
-        return self.rotate90().rotate90().rotate90()
+class Machine:
+    #Beads for every state live in one array, one count per cell for each state id, in the state's
+    #canonical orientation. A lazy machine only adds a state the first time it is looked up, which
+    #is what keeps boards bigger than 3x3 in memory.
+    def __init__(self, geometry=STANDARD, lazy=False):
+        self.geometry = geometry
+        self.cells = geometry.cells
+        self.lazy = lazy or geometry is not STANDARD
+        if self.lazy:
+            self.stateKeys, self.stateIds = array(getKeyTypecode(geometry)), {}
+        else:
+            self.stateKeys, self.stateIds = getStateIndex()
+        self.beads = array("i", bytes(len(self.stateKeys)*self.cells*4))
+        self.moves = []
+        self.changedStates = set() #State ids whose beads changed, cleared by checkpoint.Checkpointer
+        self.buildBeadTotals()
+
+        for stateId in range(len(self.stateKeys)):
+            Matchbox(self, stateId).fill()
+
+    @classmethod
+    def fromArrays(cls, stateKeys, beads, beadTotals=None, cumulativeBeads=None, geometry=STANDARD, lazy=False):
+        #The arrays may be read-only views, e.g. of a memory-mapped machine file
+        machine = cls.__new__(cls)
+        machine.setArrays(stateKeys, beads, geometry, lazy)
+        if beadTotals is not None and cumulativeBeads is not None:
+            machine.beadTotals = beadTotals
+            machine.cumulativeBeads = cumulativeBeads
+        else:
+            machine.buildBeadTotals()
+        return machine
 
-    def standardise(self):
-        currentBoard = self
-        for rot in range(4):
-            if currentBoard.state in ALL_BOARDS:
-                return currentBoard
-            currentBoard = currentBoard.rotate90()
+    def setArrays(self, stateKeys, beads, geometry, lazy):
+        self.geometry = geometry
+        self.cells = geometry.cells
+        self.lazy = lazy or geometry is not STANDARD
+        self.moves = []
+        self.changedStates = set()
+        self.beads = beads
+        self.stateKeys, self.stateIds = getStateIndex()
+        if self.lazy or stateKeys != self.stateKeys:
+            self.stateKeys = stateKeys
+            self.stateIds = {key: stateId for stateId, key in enumerate(stateKeys)}
+
+    def __getstate__(self):
+        return {"geometry": self.geometry, "lazy": self.lazy,
+                "stateKeys": array(getKeyTypecode(self.geometry), self.stateKeys), "beads": array("i", self.beads)}
+
+    def __setstate__(self, state):
+        if "matchboxes" in state:
+            self.setArrays(getStateIndex()[0], None, STANDARD, False)
+            self.loadMatchboxes(state["matchboxes"])
+        else:
+            self.setArrays(state["stateKeys"], state["beads"], state.get("geometry", STANDARD), state.get("lazy", False))
+        self.buildBeadTotals()
+
+    def buildBeadTotals(self):
+        #Running bead total and cumulative bead counts of each state, kept up to date by Box
+        self.beadTotals = array("i", bytes(len(self.stateKeys)*4))
+        self.cumulativeBeads = array("i", self.beads)
+        for stateId in range(len(self.stateKeys)):
+            self.updateCumulativeBeads(stateId)
+
+    def updateCumulativeBeads(self, stateId):
+        total = 0
+        for index in range(stateId*self.cells, (stateId+1)*self.cells):
+            total += self.beads[index]
+            self.cumulativeBeads[index] = total
+        self.beadTotals[stateId] = total
+
+    def addState(self, canonicalKey):
+        stateId = len(self.stateKeys)
+        self.stateKeys.append(canonicalKey)
+        self.stateIds[canonicalKey] = stateId
+        self.beads.extend([0]*self.cells)
+        self.cumulativeBeads.extend([0]*self.cells)
+        self.beadTotals.append(0)
+        Matchbox(self, stateId).fill()
+        return stateId
+
+    def getStateId(self, canonicalKey): #None for unknown states, unless the machine is lazy
+        stateId = self.stateIds.get(canonicalKey)
+        if stateId is None and self.lazy:
+            stateId = self.addState(canonicalKey)
+        return stateId
+
+    def getBoard(self, key):
+        if self.geometry is STANDARD:
+            return Board(getState(key))
+        return GridBoard.fromKey(self.geometry, key)
+
+    def getInitialBeads(self, canonicalKey): #The beads a newly filled box for this state gets
+        board = self.getBoard(canonicalKey)
+        eligible = board.getUniqueMoveMask()
+        beadCount = self.geometry.getInitialBeads(board.getMoveCount())
+        return [beadCount if eligible >> cell & 1 else 0 for cell in range(self.cells)]
+
+    def loadMatchboxes(self, matchboxes):
+        #Machines pickled before the bead array held one Matchbox object per state,
+        #not necessarily in canonical orientation
+        beadsByKey = {}
+        for matchbox in matchboxes:
+            key = vars(matchbox)["board"].getKey()
+            beads = [bead for row in vars(vars(matchbox)["box"])["beads"] for bead in row]
+            beadsByKey[getCanonicalKey(key)] = transformCells(beads, getCanonicalTransform(key))
+
+        if beadsByKey.keys() != self.stateIds.keys():
+            self.stateKeys = array("i", beadsByKey)
+            self.stateIds = {key: stateId for stateId, key in enumerate(self.stateKeys)}
+        self.beads = array("i", (bead for key in self.stateKeys for bead in beadsByKey[key]))
+
+    @property
+    def matchboxes(self):
+        return [Matchbox(self, stateId) for stateId in range(len(self.stateKeys))]
+
+    def pickBeads(self, canonicalKeys, rng=random): #Returns a pos: (x, y) for each of the states
+        size, cells = self.geometry.size, self.cells
+        beadTotals = self.beadTotals
+        cumulativeBeads = self.cumulativeBeads
+        beads = []
+        for key in canonicalKeys:
+            stateId = self.getStateId(key)
+            cell = bisect_right(cumulativeBeads, int(rng.random()*beadTotals[stateId]), stateId*cells, (stateId+1)*cells) - stateId*cells
+            beads.append((cell % size, cell // size))
+        return beads
+
+    def chooseMoves(self, keys, greedy=False, trajectories=None, rng=random):
+        #Returns a pos: (x, y) on each board, given by its key in any orientation, without changing the
+        #Machine (apart from a lazy machine adding new states). greedy picks the cell with the most
+        #beads instead of drawing a bead. Moves are added to trajectories[i] when it isn't None.
+        #A key the machine has no state for (an unreachable position, unless lazy) raises a ValueError.
+        geometry, size, cells = self.geometry, self.geometry.size, self.cells
+        beads, beadTotals, cumulativeBeads = self.beads, self.beadTotals, self.cumulativeBeads
+        moves = []
+        for index, key in enumerate(keys):
+            noughts, crosses = geometry.getMasks(key)
+            empty = geometry.full & ~(noughts | crosses)
+            if not empty & (empty - 1): #Only one move left
+                cell = empty.bit_length() - 1
+            else:
+                canonicalKey, transform, uniqueMoves = geometry.getSymmetryInfo(key)
+                stateId = self.getStateId(canonicalKey)
+                if stateId is None:
+                    raise ValueError("Key {} is not a reachable position for this machine".format(key))
+                offset = stateId*cells
+                if greedy:
+                    canonicalCell = max(range(cells), key=beads[offset:offset+cells].__getitem__)
+                else:
+                    canonicalCell = bisect_right(cumulativeBeads, int(rng.random()*beadTotals[stateId]), offset, offset+cells) - offset
+                if trajectories is not None and trajectories[index] is not None:
+                    trajectories[index].moves.append((stateId, canonicalCell))
+                cell = geometry.transformCells[transform][canonicalCell]
+            moves.append((cell % size, cell // size))
+        return moves
 
-        currentBoard = self.flipH()
-        for rot in range(4):
-            if currentBoard.state in ALL_BOARDS:
-                return currentBoard
-            currentBoard = currentBoard.rotate90()
+    def applyTrajectory(self, trajectory, result, winDelta=3, drawDelta=1, loseDelta=-1): #Tile.Empty = draw
+        won = Tile.Noughts if trajectory.started else Tile.Crosses
+        beadChange = drawDelta if result == Tile.Empty else winDelta if result == won else loseDelta
+        self.addMoveBeads(trajectory.moves, beadChange)
 
-        logging.error("Could not find standardised board")
-        raise ValueError
+    def addMoveBeads(self, moves, beadChange): #moves: (state id, cell) pairs, with the cell on the canonical board
+        size = self.geometry.size
+        for stateId, cell in moves:
+            matchbox = Matchbox(self, stateId)
+            matchbox.addBeads((cell % size, cell // size), beadChange)
+            if matchbox.isEmpty():
+                matchbox.fill()
 
-class Machine:
-    def __init__(self):
-        self.matchboxes = [Matchbox(board) for board in ALL_BOARDS]
-        self.moves = []
+    def getMatchboxByKey(self, canonicalKey):
+        stateId = self.getStateId(canonicalKey)
+        return None if stateId is None else Matchbox(self, stateId)
 
     def getMatchbox(self, board):
-        standardisedBoard = board.standardise()
-        for matchbox in self.matchboxes:
-            if matchbox.board == standardisedBoard:
-                return matchbox
+        return self.getMatchboxByKey(board.getSymmetryInfo()[0])
+
+    def getBeadGrid(self, board): #The beads on each cell of board, in board's orientation
+        canonicalKey, transform, uniqueMoves = board.getSymmetryInfo()
+        size, cells = self.geometry.size, self.cells
+        offset = self.getStateId(canonicalKey)*cells
+        beads = [0]*cells
+        for canonicalCell, cell in enumerate(self.geometry.transformCells[transform]):
+            beads[cell] = self.beads[offset + canonicalCell]
+        return [beads[y*size:(y+1)*size] for y in range(size)]
 
     def startTrainingGame(self):
         self.moves = []
 
-    def makeMove(self, board, training=True):
+    def makeMove(self, board, training=True, rng=random):
+        #Returns the board after the machine's move, in the same orientation as board.
         #Assuming a full board or finished game will never be given
-        def findEmptyTile(board):
-            for y in range(3):
-                for x in range(3):
-                    if board[y][x] is Tile.Empty:
-                        return (x, y)
-        
-        board = board.standardise()
-        
-        matchbox = self.getMatchbox(board)
-        
-        if board.getMoveCount() == 8:
-            bead = findEmptyTile(board)
-        else:
-            bead = matchbox.pickBead()
-            if training:
-                self.moves.append((matchbox, bead))
-
-        return board.makeMove(bead)
+        size, cells = self.geometry.size, self.cells
+        if board.getMoveCount() == cells - 1: #The last move is forced and has no beads
+            for cell in range(cells):
+                if board.isValidMove(cell % size, cell // size):
+                    return board.makeMove((cell % size, cell // size))
+
+        canonicalKey, transform, uniqueMoves = board.getSymmetryInfo()
+        stateId = self.getStateId(canonicalKey)
+        if stateId is None:
+            raise ValueError("Key {} is not a reachable position for this machine".format(board.getKey()))
+        offset = stateId*cells
+        canonicalCell = bisect_right(self.cumulativeBeads, int(rng.random()*self.beadTotals[stateId]), offset, offset+cells) - offset
+        if training:
+            self.moves.append((stateId, canonicalCell))
+        cell = self.geometry.transformCells[transform][canonicalCell]
+        return board.makeMove((cell % size, cell // size))
 
     def endTrainingGame(self, result, started, winDelta=3, drawDelta=1, loseDelta=-1): #Tile.Empty = draw
         beadChange = drawDelta if result == Tile.Empty else winDelta if ((result == Tile.Noughts and started) or (result == Tile.Crosses and not started)) else loseDelta
-        for matchbox, bead in self.moves:
-            matchbox.addBeads(bead, beadChange)
-            if matchbox.isEmpty():
-                matchbox.fill()
+        self.addMoveBeads(self.moves, beadChange)
+
+def loadMachine(path="trainedMachine.pickle"):
+    with open(path, "rb") as file:
+        return Unpickler(file).load()
+
+def saveMachine(machine, path="trainedMachine.pickle"):
+    with open(path, "wb") as file:
+        pickle.dump(machine, file)
 
 class GameManager:
+    boardType = BitBoard #Any class with the Board API, e.g. Board, used for 3x3 games
+    gameLog = None #A gameLog.GameLogWriter every game played is recorded to
+
+    @staticmethod
+    def newBoard(geometry):
+        return GameManager.boardType.empty() if geometry is STANDARD else geometry.newBoard()
+
     @staticmethod
-    def playAgainstHuman(machine, machineStart=True, training=True, winDelta=3, drawDelta=1, loseDelta=-1):
-        board = Board([[Tile.Empty, Tile.Empty, Tile.Empty],
-                       [Tile.Empty, Tile.Empty, Tile.Empty],
-                       [Tile.Empty, Tile.Empty, Tile.Empty]])
+    def playAgainstHuman(machine, machineStart=True, training=True, winDelta=3, drawDelta=1, loseDelta=-1, rng=random):
+        board = GameManager.newBoard(machine.geometry)
+        maxCoordinate = machine.geometry.size - 1
 
         if training:
             machine.startTrainingGame()
 
+        gameLog = GameManager.gameLog
+        plies = []
+
         machineTurn = machineStart
         while not board.isGameOver():
+            before = board
             if machineTurn:
-                print("\n{}".format(board.standardise()))
-                print(machine.getMatchbox(board).box.beads)
-                board = machine.makeMove(board, training)
+                print("\n{}".format(board))
+                print(machine.getBeadGrid(board))
+                board = machine.makeMove(board, training, rng)
             else:
                 print("\n{}".format(board))
                 x, y = -1, -1
@@ -243,13 +454,17 @@ class GameManager:
                     try:
                         x, y = list(map(int, input("Enter your move (x y): ").split()))
                         if not board.isValidMove(x, y):
-                            print("2 integers between 0 and 2, at a position that is empty!")
+                            print("2 integers between 0 and {}, at a position that is empty!".format(maxCoordinate))
                     except (TypeError, ValueError):
-                        print("Oi! Enter 2 integers between 0 and 2 with a space between 'em.")
+                        print("Oi! Enter 2 integers between 0 and {} with a space between 'em.".format(maxCoordinate))
                 board = board.makeMove((x, y))
+            if gameLog is not None:
+                plies.append(gameLog.getCanonicalMove(before, board))
             machineTurn = not machineTurn
 
         result = board.isGameOver()
+        if gameLog is not None:
+            gameLog.logGame(plies, result, machineStart)
         print("\n{}\n{}!".format(board, "Crosses won" if result is Tile.Crosses else "Noughts won" if result is Tile.Noughts else "It was a tie"))
 
         if training:
@@ -258,33 +473,39 @@ class GameManager:
         return result
 
     @staticmethod
-    def playAgainstRandom(machine, machineStart=True, training=True, winDelta=1, drawDelta=0, loseDelta=-10):
+    def playAgainstRandom(machine, machineStart=True, training=True, winDelta=1, drawDelta=0, loseDelta=-10, rng=random):
         def getRandomMove(board):
-            uniqueMoves = board.getUniqueMoves()
-            chosenMove = random.randint(1, sum(map(sum, uniqueMoves)))
-            for y in range(3):
-                for x in range(3):
-                    if uniqueMoves[y][x]:
-                        chosenMove -= 1
-                        if chosenMove <= 0:
-                            return (x, y)
+            size = machine.geometry.size
+            uniqueMoves = board.getUniqueMoveMask()
+            chosenMove = int(rng.random()*bin(uniqueMoves).count("1"))
+            for cell in range(machine.cells):
+                if uniqueMoves >> cell & 1:
+                    if not chosenMove:
+                        return (cell % size, cell // size)
+                    chosenMove -= 1
         
-        board = Board([[Tile.Empty, Tile.Empty, Tile.Empty],
-                       [Tile.Empty, Tile.Empty, Tile.Empty],
-                       [Tile.Empty, Tile.Empty, Tile.Empty]])
+        board = GameManager.newBoard(machine.geometry)
         
         if training:
             machine.startTrainingGame()
         
+        gameLog = GameManager.gameLog
+        plies = []
+        
         machineTurn = machineStart
         while not board.isGameOver():
+            before = board
             if machineTurn:
-                board = machine.makeMove(board, training)
+                board = machine.makeMove(board, training, rng)
             else:
                 board = board.makeMove(getRandomMove(board))
+            if gameLog is not None:
+                plies.append(gameLog.getCanonicalMove(before, board))
             machineTurn = not machineTurn
         
         result = board.isGameOver()
+        if gameLog is not None:
+            gameLog.logGame(plies, result, machineStart)
         
         if training:
             machine.endTrainingGame(result, machineStart, winDelta, drawDelta, loseDelta)
@@ -292,25 +513,31 @@ class GameManager:
         return result
 
     @staticmethod
-    def playAgainstMachine(machine1, machine2, machine1Start=True, training1=True, training2=True, winDelta1=3, drawDelta1=1, loseDelta1=-1, winDelta2=3, drawDelta2=1, loseDelta2=-1):
-        board = Board([[Tile.Empty, Tile.Empty, Tile.Empty],
-                       [Tile.Empty, Tile.Empty, Tile.Empty],
-                       [Tile.Empty, Tile.Empty, Tile.Empty]])
+    def playAgainstMachine(machine1, machine2, machine1Start=True, training1=True, training2=True, winDelta1=3, drawDelta1=1, loseDelta1=-1, winDelta2=3, drawDelta2=1, loseDelta2=-1, rng=random):
+        board = GameManager.newBoard(machine1.geometry)
 
         if training1:
             machine1.startTrainingGame()
         if training2:
             machine2.startTrainingGame()
 
+        gameLog = GameManager.gameLog #Games are logged from machine1's side
+        plies = []
+
         machine1Turn = machine1Start
         while not board.isGameOver():
+            before = board
             if machine1Turn:
-                board = machine1.makeMove(board, training1)
+                board = machine1.makeMove(board, training1, rng)
             else:
-                board = machine2.makeMove(board, training2)
+                board = machine2.makeMove(board, training2, rng)
+            if gameLog is not None:
+                plies.append(gameLog.getCanonicalMove(before, board))
             machine1Turn = not machine1Turn
 
         result = board.isGameOver()
+        if gameLog is not None:
+            gameLog.logGame(plies, result, machine1Start)
 
         if training1:
             machine1.endTrainingGame(result, machine1Start, winDelta1, drawDelta1, loseDelta1)
@@ -320,26 +547,90 @@ class GameManager:
         return result
 
 if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    parser = argparse.ArgumentParser(description="Train a machine against a random player until Ctrl-C.")
+    parser.add_argument("--machine", default="trainedMachine.pickle", help="pickle file the machine is loaded from and saved to")
+    parser.add_argument("--size", type=int, default=3, help="board size for a new machine")
+    parser.add_argument("--win-length", type=int, help="tiles in a row needed to win for a new machine (default: size)")
+    parser.add_argument("--workers", type=int, default=1, help="number of training processes (3x3 only)")
+    parser.add_argument("--sync-games", type=int, default=20000, help="games each worker plays between bead merges")
+    parser.add_argument("--merge", choices=("sum", "average"), default="sum", help="how worker bead changes are combined")
+    parser.add_argument("--checkpoint", default="trainedMachine.checkpoint", help="checkpoint file, resumed from if it exists")
+    parser.add_argument("--checkpoint-games", type=int, help="checkpoint after this many games")
+    parser.add_argument("--checkpoint-seconds", type=float, help="checkpoint after this many seconds")
+    parser.add_argument("--telemetry-seconds", type=float, help="log games/sec, results and hot path timings this often (single process only)")
+    parser.add_argument("--profile", help="write cProfile stats of a window of games to this file (single process only)")
+    parser.add_argument("--profile-after", type=int, default=0, help="games played before the profiled window starts")
+    parser.add_argument("--profile-games", type=int, default=1000, help="games in the profiled window")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible run: the same seed and games give the same beads")
+    args = parser.parse_args()
     try:
-        with open("trainedMachine.pickle", "rb") as file:
-            machine = pickle.load(file)
+        geometry = getGeometry(args.size, args.win_length) #For a new machine
+    except ValueError as error:
+        parser.error(str(error))
+
+    checkpointing = args.checkpoint_games is not None or args.checkpoint_seconds is not None
+    machine = None
+    if checkpointing:
+        from checkpoint import Checkpointer, loadCheckpoint
+
+        machine = loadCheckpoint(args.checkpoint)
+        if machine is not None:
+            logging.info("Resumed machine from {}.".format(args.checkpoint))
+
+    if machine is None:
+        try:
+            machine = loadMachine(args.machine)
             logging.info("Loaded machine from pickle file.")
-    except:
-        logging.info("Could not find pickle file, so creating a blank machine.")
-        machine = Machine()
+        except:
+            logging.info("Could not find pickle file, so creating a blank machine.")
+            machine = Machine(geometry)
 
-    try:
-        logging.info("Start training.")
-        iteration = 0
+    if args.workers > 1 and machine.geometry is not STANDARD:
+        parser.error("--workers only supports 3x3 machines, not {}".format(machine.geometry))
+
+    checkpointer = Checkpointer(machine, args.checkpoint, args.checkpoint_games, args.checkpoint_seconds) if checkpointing else None
+
+    if args.workers > 1:
+        from parallelTraining import trainInParallel
+
+        logging.info("Start training with {} workers.".format(args.workers))
         startTime = time.time()
-        while True:
-            iteration += 1
-            GameManager.playAgainstRandom(machine, iteration%2)
-    except KeyboardInterrupt:
+        iteration = trainInParallel(machine, args.workers, args.sync_games, merge=args.merge, checkpointer=checkpointer, seed=args.seed)
         endTime = time.time()
         logging.info("Stopped training.")
-        logging.info("Played {} games in {} minutes.".format(iteration, int((endTime-startTime)/60)))
-
-    with open("trainedMachine.pickle", "wb") as file:
-        pickle.dump(machine, file)
-        logging.info("Saved trainedMachine to pickle file.")
+        logging.info("Played {} games in {} minutes ({:.0f} games/sec).".format(iteration, int((endTime-startTime)/60), iteration/(endTime-startTime)))
+    else:
+        telemetry = None
+        if args.telemetry_seconds is not None or args.profile is not None:
+            import sys
+            from telemetry import Telemetry
+
+            telemetry = Telemetry(args.telemetry_seconds, args.profile, args.profile_after, args.profile_games)
+            telemetry.install(sys.modules[__name__])
+
+        try:
+            logging.info("Start training.")
+            rng = random.Random(args.seed)
+            iteration = 0
+            startTime = time.time()
+            while True:
+                iteration += 1
+                GameManager.playAgainstRandom(machine, iteration%2, rng=rng)
+                if checkpointer is not None:
+                    checkpointer.gamePlayed()
+        except KeyboardInterrupt:
+            endTime = time.time()
+            logging.info("Stopped training.")
+            logging.info("Played {} games in {} minutes ({:.0f} games/sec).".format(iteration, int((endTime-startTime)/60), iteration/(endTime-startTime)))
+            if telemetry is not None:
+                telemetry.uninstall()
+                telemetry.logReport()
+
+    saveMachine(machine, args.machine)
+    logging.info("Saved machine to {}.".format(args.machine))
+    if checkpointer is not None:
+        checkpointer.compact()
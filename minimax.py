@@ -0,0 +1,125 @@
+import logging
+import os
+import pickle
+import time
+
+from bitBoard import FULL, IS_WINNING, MOVE_COUNTS, NOUGHT_MASKS, CROSS_MASKS
+from boardGeometry import STANDARD
+from boardTables import CANONICAL_KEYS, getCallerMove
+
+#Perfect play for the 3x3 game. For every canonical key that can come up in a game, SOLUTIONS
+#holds the value for the player to move (1 win, 0 draw, -1 loss) and a mask of the cells
+#(on the canonical board) that keep that value. Solved once and cached next to this file.
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "minimax.pickle")
+POWERS = [3**cell for cell in range(9)]
+SOLUTIONS = None
+
+def negamax(key, solutions):
+    if key in solutions:
+        return solutions[key][0]
+
+    noughts, crosses = NOUGHT_MASKS[key], CROSS_MASKS[key]
+    if IS_WINNING[noughts] or IS_WINNING[crosses]: #The player who just moved won
+        solutions[key] = (-1, 0)
+        return -1
+    empty = FULL & ~(noughts | crosses)
+    if not empty:
+        solutions[key] = (0, 0)
+        return 0
+
+    digit = 1 if MOVE_COUNTS[noughts] == MOVE_COUNTS[crosses] else 2
+    best, optimalMoves = -2, 0
+    for cell in range(9):
+        if empty >> cell & 1:
+            value = -negamax(CANONICAL_KEYS[key + digit*POWERS[cell]], solutions)
+            if value > best:
+                best, optimalMoves = value, 1 << cell
+            elif value == best:
+                optimalMoves |= 1 << cell
+    solutions[key] = (best, optimalMoves)
+    return best
+
+def solve(cachePath=CACHE_PATH):
+    global SOLUTIONS
+    if SOLUTIONS is None:
+        try:
+            with open(cachePath, "rb") as file:
+                SOLUTIONS = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            startTime = time.time()
+            SOLUTIONS = {}
+            negamax(0, SOLUTIONS)
+            logging.debug("Solved {} states in {:.0f} ms.".format(len(SOLUTIONS), (time.time() - startTime)*1000))
+            try:
+                with open(cachePath, "wb") as file:
+                    pickle.dump(SOLUTIONS, file)
+            except OSError:
+                logging.warning("Could not cache the solved states in {}.".format(cachePath))
+    return SOLUTIONS
+
+def getValue(key): #For the player to move on the board with this key
+    return solve()[CANONICAL_KEYS[key]][0]
+
+def getOptimalMoveMask(key): #Cells of the board with this key (in its own orientation) that play perfectly
+    optimalMoves = solve()[CANONICAL_KEYS[key]][1]
+    return sum(1 << getCallerMove(key, cell) for cell in range(9) if optimalMoves >> cell & 1)
+
+def evaluateMachine(machine):
+    #Scores the bead distribution of every state where the machine chooses a move (the forced
+    #last move is skipped) against perfect play, in one pass over the bead arrays.
+    #optimalMass is the percentage of all beads that are on optimal moves, meanOptimalShare the
+    #same per state averaged over states, and a blunder state is one where a move that is not optimal
+    #is more likely than every optimal move.
+    if machine.geometry is not STANDARD:
+        raise ValueError("The solver only supports the 3x3 board, not {}".format(machine.geometry))
+
+    solutions = solve()
+    beads, beadTotals, cells = machine.beads, machine.beadTotals, machine.cells
+    states = optimalBeads = allBeads = 0
+    optimalShare = 0.0
+    blunderKeys = []
+    for stateId, key in enumerate(machine.stateKeys):
+        optimalMoves = solutions.get(key, (0, 0))[1]
+        total = beadTotals[stateId]
+        if not optimalMoves or not total or MOVE_COUNTS[NOUGHT_MASKS[key] | CROSS_MASKS[key]] >= cells - 1:
+            continue
+
+        stateBeads = beads[stateId*cells:(stateId+1)*cells]
+        onOptimal = bestOptimal = bestOther = 0
+        for cell, count in enumerate(stateBeads):
+            if optimalMoves >> cell & 1:
+                onOptimal += count
+                bestOptimal = max(bestOptimal, count)
+            else:
+                bestOther = max(bestOther, count)
+        states += 1
+        optimalBeads += onOptimal
+        allBeads += total
+        optimalShare += onOptimal/total
+        if bestOther > bestOptimal:
+            blunderKeys.append(key)
+
+    return {"states": states,
+            "optimalMass": 100*optimalBeads/allBeads if allBeads else 0.0,
+            "meanOptimalShare": 100*optimalShare/states if states else 0.0,
+            "blunderStates": len(blunderKeys),
+            "blunderKeys": blunderKeys}
+
+if __name__ == "__main__":
+    import argparse
+
+    from machineLearningSimulation import loadMachine
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    parser = argparse.ArgumentParser(description="Score a machine's beads against perfect play.")
+    parser.add_argument("machine", nargs="?", default="trainedMachine.pickle")
+    args = parser.parse_args()
+
+    machine = loadMachine(args.machine)
+    solve()
+    startTime = time.time()
+    evaluation = evaluateMachine(machine)
+    logging.info("Evaluated {} states in {:.1f} ms.".format(evaluation["states"], (time.time() - startTime)*1000))
+    logging.info("{:.1f}% of the beads are on optimal moves ({:.1f}% per state on average).".format(evaluation["optimalMass"], evaluation["meanOptimalShare"]))
+    logging.info("{} states would most likely blunder.".format(evaluation["blunderStates"]))
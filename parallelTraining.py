@@ -0,0 +1,85 @@
+import logging
+import random
+import signal
+import time
+from multiprocessing import Pool
+
+from batchTraining import trainAgainstRandom
+from boardGeometry import STANDARD
+
+def getBeads(machine):
+    cells = machine.cells
+    return {key: machine.beads[stateId*cells:(stateId+1)*cells].tolist() for stateId, key in enumerate(machine.stateKeys)}
+
+def getBeadDeltas(before, machine):
+    #States a lazy machine added since before are compared with a freshly filled box,
+    #which is what applyBeadDeltas starts from when it adds them to another machine
+    deltas = {}
+    for key, beads in getBeads(machine).items():
+        delta = [new - old for new, old in zip(beads, before[key] if key in before else machine.getInitialBeads(key))]
+        if any(delta):
+            deltas[key] = delta
+    return deltas
+
+def applyBeadDeltas(machine, deltas):
+    for key, delta in deltas.items():
+        matchbox = machine.getMatchboxByKey(key)
+        size = machine.geometry.size
+        for cell, change in enumerate(delta):
+            if change:
+                matchbox.addBeads((cell % size, cell // size), change)
+        if matchbox.isEmpty():
+            matchbox.fill()
+
+def mergeBeadDeltas(workerDeltas, merge="sum"):
+    merged = {}
+    for deltas in workerDeltas:
+        for key, delta in deltas.items():
+            total = merged.setdefault(key, [0]*len(delta))
+            for cell, change in enumerate(delta):
+                total[cell] += change
+    if merge == "average":
+        merged = {key: [round(change/len(workerDeltas)) for change in delta] for key, delta in merged.items()}
+    elif merge != "sum":
+        raise ValueError("Unknown merge mode: {}".format(merge))
+    return merged
+
+def ignoreInterrupts():
+    #Ctrl-C is handled by the parent, which stops the pool itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def trainWorker(machine, games, seed, winDelta, drawDelta, loseDelta):
+    rng = random.Random(seed)
+    before = getBeads(machine)
+    startTime = time.time()
+    trainAgainstRandom(machine, games, winDelta=winDelta, drawDelta=drawDelta, loseDelta=loseDelta, rng=rng)
+    return getBeadDeltas(before, machine), time.time() - startTime
+
+def trainInParallel(machine, workers, syncGames=20000, rounds=None, merge="sum", winDelta=1, drawDelta=0, loseDelta=-10, checkpointer=None, seed=None):
+    #Each round every worker trains its own copy of the machine for syncGames games,
+    #then the bead changes are merged into machine and the next round starts from it.
+    #Runs until rounds is reached or Ctrl-C, and returns the number of games played.
+    #Worker seeds are drawn from one generator seeded with seed, so a seeded run is reproducible.
+    if machine.geometry is not STANDARD: #Checked here rather than failing in every worker
+        raise ValueError("Parallel training only supports the 3x3 board, not {}".format(machine.geometry))
+    rng = random.Random(seed)
+    gamesPlayed = 0
+    with Pool(workers, initializer=ignoreInterrupts) as pool:
+        try:
+            roundNumber = 0
+            while rounds is None or roundNumber < rounds:
+                roundNumber += 1
+                startTime = time.time()
+                jobs = [(machine, syncGames, rng.getrandbits(64), winDelta, drawDelta, loseDelta) for worker in range(workers)]
+                workerResults = pool.starmap(trainWorker, jobs)
+                applyBeadDeltas(machine, mergeBeadDeltas([deltas for deltas, seconds in workerResults], merge))
+                roundSeconds = time.time() - startTime
+
+                gamesPlayed += syncGames*workers
+                if checkpointer is not None:
+                    checkpointer.gamePlayed(syncGames*workers)
+                logging.info("Round {}: {:.0f} games/sec in total, per worker: {}".format(
+                    roundNumber, syncGames*workers/roundSeconds, ", ".join("{:.0f}".format(syncGames/seconds) for deltas, seconds in workerResults)))
+        except KeyboardInterrupt:
+            pool.terminate()
+    return gamesPlayed
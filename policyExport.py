@@ -0,0 +1,72 @@
+import sys
+from array import array
+
+from bitBoard import FULL, IS_WINNING, MOVE_COUNTS, NOUGHT_MASKS, CROSS_MASKS
+from boardGeometry import STANDARD
+from boardTables import CANONICAL_KEYS, UNIQUE_MOVES, getCallerMove
+from policyPlayer import MAGIC, VERSION, HEADER, STATE_COUNT, PROBABILITY_SCALE
+
+def compilePolicy(machine, probabilities=False):
+    #Resolves every raw board key to the machine's move on that board. Returns the moves array and,
+    #with probabilities, the cumulative move probabilities (see policyPlayer.py for both).
+    #Boards that can come up in a game but that a lazy machine hasn't seen play their first unique move.
+    if machine.geometry is not STANDARD:
+        raise ValueError("Policies can only be exported for the 3x3 board, not {}".format(machine.geometry))
+
+    beads, cells = machine.beads, machine.cells
+    moves = array("b", [-1])*STATE_COUNT
+    cumulative = array("H", bytes(STATE_COUNT*9*2)) if probabilities else None
+    for key in range(STATE_COUNT):
+        noughts, crosses = NOUGHT_MASKS[key], CROSS_MASKS[key]
+        empty = FULL & ~(noughts | crosses)
+        if not empty or IS_WINNING[noughts] or IS_WINNING[crosses] or not 0 <= MOVE_COUNTS[noughts] - MOVE_COUNTS[crosses] <= 1:
+            continue
+
+        weights = [0]*9
+        stateId = machine.stateIds.get(CANONICAL_KEYS[key])
+        if empty & (empty - 1) and stateId is not None and machine.beadTotals[stateId]:
+            stateBeads = beads[stateId*cells:(stateId+1)*cells]
+            for canonicalCell, count in enumerate(stateBeads):
+                weights[getCallerMove(key, canonicalCell)] = count
+            #Ties go to the first cell of the canonical board, as in Machine.chooseMoves
+            moves[key] = getCallerMove(key, max(range(9), key=stateBeads.__getitem__))
+        else: #The forced last move, or a state without beads
+            moves[key] = (UNIQUE_MOVES[key] & -UNIQUE_MOVES[key]).bit_length() - 1
+            weights[moves[key]] = 1
+
+        if probabilities:
+            total, running = sum(weights), 0
+            for cell in range(9):
+                running += weights[cell]
+                cumulative[key*9 + cell] = running*PROBABILITY_SCALE // total
+    return moves, cumulative
+
+def savePolicy(moves, cumulative, path):
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 9, cumulative is not None))
+        file.write(moves.tobytes())
+        if cumulative is not None:
+            if sys.byteorder == "big":
+                cumulative = array("H", cumulative)
+                cumulative.byteswap()
+            file.write(cumulative.tobytes())
+
+def exportPolicy(machine, path="trainedMachine.policy", probabilities=False):
+    savePolicy(*compilePolicy(machine, probabilities), path)
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    from machineLearningSimulation import loadMachine
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Compile a machine into a lookup table for policyPlayer.py.")
+    parser.add_argument("machine", nargs="?", default="trainedMachine.pickle")
+    parser.add_argument("policy", nargs="?", default="trainedMachine.policy")
+    parser.add_argument("--probabilities", action="store_true", help="also store the move probabilities, for sampled play")
+    args = parser.parse_args()
+
+    exportPolicy(loadMachine(args.machine), args.policy, args.probabilities)
+    logging.info("Exported {} to {}.".format(args.machine, args.policy))
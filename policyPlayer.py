@@ -0,0 +1,90 @@
+import random
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+#Plays from a policy file written by policyExport.py, without importing any of the training code.
+#A policy file is a header followed by little-endian arrays indexed by the base 3 key of the raw board
+#(cell y*3+x is digit y*3+x, 0 empty, 1 noughts, 2 crosses):
+#  moves: int8 per key, the cell with the most beads, or -1 when the game is over or can't happen
+#  cumulative (optional): 9 uint16 per key, the running total of the move probabilities out of 65535
+MAGIC = b"NACPOLI\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHB") #Magic, version, cells, has cumulative probabilities
+STATE_COUNT = 3**9
+POWERS = [3**cell for cell in range(9)]
+PROBABILITY_SCALE = 65535
+
+def getKey(digits): #digits: 9 cells row by row, 0 empty, 1 noughts, 2 crosses
+    return sum(digit*power for digit, power in zip(digits, POWERS))
+
+class PolicyPlayer:
+    def __init__(self, moves, cumulative=None):
+        self.moves = moves
+        self.cumulative = cumulative
+
+    @classmethod
+    def load(cls, path="trainedMachine.policy"):
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) < HEADER.size:
+            raise ValueError("{} is too short to be a policy file".format(path))
+        magic, version, cells, hasCumulative = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or cells != 9:
+            raise ValueError("{} is not a version {} 3x3 policy file".format(path, VERSION))
+
+        moves = array("b", data[HEADER.size:HEADER.size+STATE_COUNT])
+        cumulative = None
+        if hasCumulative:
+            cumulative = array("H")
+            cumulative.frombytes(data[HEADER.size+STATE_COUNT:HEADER.size+STATE_COUNT+STATE_COUNT*9*2])
+            if sys.byteorder == "big":
+                cumulative.byteswap()
+        if len(moves) != STATE_COUNT or cumulative is not None and len(cumulative) != STATE_COUNT*9:
+            raise ValueError("{} is cut short".format(path))
+        return cls(moves, cumulative)
+
+    def getMove(self, key): #Returns a pos: (x, y), or None if the game is over
+        cell = self.moves[key]
+        return None if cell < 0 else (cell % 3, cell // 3)
+
+    def sampleMove(self, key, rng=random): #Draws a move with the machine's bead probabilities
+        if self.cumulative is None:
+            raise ValueError("This policy has no probabilities, export it with them to sample moves")
+        if self.moves[key] < 0:
+            return None
+        cell = bisect_right(self.cumulative, rng.randrange(PROBABILITY_SCALE), key*9, key*9 + 9) - key*9
+        return (cell % 3, cell // 3)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play noughts and crosses against an exported policy.")
+    parser.add_argument("policy", nargs="?", default="trainedMachine.policy")
+    parser.add_argument("--second", action="store_true", help="let the policy play first")
+    parser.add_argument("--sample", action="store_true", help="draw moves instead of always playing the most likely one")
+    args = parser.parse_args()
+
+    def printBoard(digits):
+        print("\n" + "\n-+-+-\n".join("|".join(" OX"[digit] for digit in digits[row*3:row*3+3]) for row in range(3)))
+
+    player = PolicyPlayer.load(args.policy)
+    digits = [0]*9
+    humanTurn = not args.second
+    while player.getMove(getKey(digits)) is not None: #The policy has no move once the game is over
+        if humanTurn:
+            printBoard(digits)
+            x = y = -1
+            while not (0 <= x < 3 and 0 <= y < 3 and digits[y*3 + x] == 0):
+                try:
+                    x, y = map(int, input("Enter your move (x y): ").split())
+                except ValueError:
+                    pass
+        else:
+            x, y = player.sampleMove(getKey(digits)) if args.sample else player.getMove(getKey(digits))
+        digits[y*3 + x] = 1 if digits.count(1) == digits.count(2) else 2
+        humanTurn = not humanTurn
+
+    printBoard(digits)
+    print("Game over!")
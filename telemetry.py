@@ -0,0 +1,151 @@
+import cProfile
+import logging
+from collections import Counter
+from functools import wraps
+from time import perf_counter
+
+from bitBoard import BitBoard
+from boardGeometry import GridBoard
+from boardTables import Tile
+
+#Counters and timers for the training hot paths. Nothing is wrapped until install(), so a
+#machine that is trained without telemetry runs exactly the same code as before.
+#Timers are inclusive: makeMove's time also holds the getSymmetryInfo call inside it.
+TIMED_METHODS = (("Machine", "makeMove"), ("Machine", "endTrainingGame"), ("Board", "getSymmetryInfo"))
+TIMED_BOARDS = (BitBoard, GridBoard)
+SEATS = ("first", "second")
+OUTCOMES = ("win", "draw", "loss")
+
+class Telemetry:
+    def __init__(self, logSeconds=10, profilePath=None, profileAfter=0, profileGames=1000):
+        #With a profilePath, games profileAfter to profileAfter + profileGames are profiled
+        #and the cProfile stats are written there
+        self.logSeconds = logSeconds
+        self.profilePath = profilePath
+        self.profileAfter = profileAfter
+        self.profileGames = profileGames
+
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.results = {seat: Counter() for seat in SEATS} #Since the last report
+        self.games = 0
+        self.refills = 0
+        self.endingGame = False
+        self.profiler = None
+        self.patched = []
+
+        self.startTime = self.lastLogTime = perf_counter()
+        self.lastLogGames = 0
+
+    def install(self, simulation=None):
+        #simulation is the machineLearningSimulation module whose classes are wrapped;
+        #pass sys.modules["__main__"] when it is running as a script
+        if simulation is None:
+            import machineLearningSimulation as simulation
+
+        methods = [(getattr(simulation, owner), name) for owner, name in TIMED_METHODS] + [(board, "getSymmetryInfo") for board in TIMED_BOARDS]
+        for owner, name in methods:
+            self.patch(owner, name, self.timed("{}.{}".format(owner.__name__, name), owner.__dict__[name]))
+
+        fill = simulation.Matchbox.__dict__["fill"]
+        @wraps(fill)
+        def countRefills(matchbox):
+            if self.endingGame: #Only a box emptied by training is a refill
+                self.refills += 1
+            return fill(matchbox)
+        self.patch(simulation.Matchbox, "fill", countRefills)
+
+        endTrainingGame = simulation.Machine.__dict__["endTrainingGame"]
+        @wraps(endTrainingGame)
+        def recordGame(machine, result, started, *args, **kwargs):
+            self.endingGame = True
+            try:
+                return endTrainingGame(machine, result, started, *args, **kwargs)
+            finally:
+                self.endingGame = False
+                self.gamePlayed(result, started)
+        self.patch(simulation.Machine, "endTrainingGame", recordGame)
+        self.updateProfiler()
+
+    def patch(self, owner, name, replacement):
+        self.patched.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, replacement)
+
+    def uninstall(self):
+        if self.profiler is not None:
+            self.stopProfiling()
+        while self.patched:
+            owner, name, original = self.patched.pop()
+            setattr(owner, name, original)
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exception):
+        self.uninstall()
+
+    def timed(self, name, function):
+        calls, seconds = self.calls, self.seconds
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            startTime = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                calls[name] += 1
+                seconds[name] += perf_counter() - startTime
+        return wrapper
+
+    def gamePlayed(self, result, started):
+        #Called for every trained game, from the machine's point of view
+        won = Tile.Noughts if started else Tile.Crosses
+        self.results[SEATS[not started]]["draw" if result is Tile.Empty else "win" if result is won else "loss"] += 1
+        self.games += 1
+
+        self.updateProfiler()
+        if self.logSeconds is not None and perf_counter() - self.lastLogTime >= self.logSeconds:
+            self.logReport()
+
+    def updateProfiler(self):
+        if self.profilePath is not None:
+            if self.profiler is None and self.games == self.profileAfter:
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+            elif self.profiler is not None and self.games >= self.profileAfter + self.profileGames:
+                self.stopProfiling()
+
+    def stopProfiling(self):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.profilePath)
+        logging.info("Wrote a profile of games {} to {} to {}.".format(self.profileAfter, self.games, self.profilePath))
+        self.profiler = None
+        self.profilePath = None
+
+    def getReport(self):
+        now = perf_counter()
+        #Results are rates over the games since the last report
+        report = {"games": self.games,
+                  "gamesPerSecond": self.games/max(now - self.startTime, 1e-9),
+                  "recentGamesPerSecond": (self.games - self.lastLogGames)/max(now - self.lastLogTime, 1e-9),
+                  "refills": self.refills,
+                  "results": {}, "calls": {}}
+        for seat, results in self.results.items():
+            games = sum(results.values())
+            report["results"][seat] = {outcome: results[outcome]/games if games else 0.0 for outcome in OUTCOMES}
+        for name, calls in self.calls.items():
+            report["calls"][name] = {"calls": calls, "usPerCall": self.seconds[name]/calls*1e6}
+        return report
+
+    def logReport(self):
+        report = self.getReport()
+        logging.info("{} games, {:.0f} games/sec ({:.0f} recently), {} refills.".format(
+            report["games"], report["gamesPerSecond"], report["recentGamesPerSecond"], report["refills"]))
+        for seat, rates in report["results"].items():
+            logging.info("Playing {}: {}.".format(seat, ", ".join("{} {:.1%}".format(outcome, rates[outcome]) for outcome in OUTCOMES)))
+        for name, timing in sorted(report["calls"].items()):
+            logging.info("{}: {} calls, {:.2f} us/call.".format(name, timing["calls"], timing["usPerCall"]))
+        self.lastLogTime = perf_counter()
+        self.lastLogGames = self.games
+        for results in self.results.values():
+            results.clear()